@@ -74,11 +74,18 @@ User=thingdb
 Group=thingdb
 WorkingDirectory=/var/lib/thingdb/app
 Environment="PATH=/var/lib/thingdb/app/venv/bin:/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin"
+# One intra-op thread per process: the model is loaded in the gunicorn master, and
+# a multi-threaded OpenMP pool started there doesn't survive the fork into workers
+Environment="EMBEDDING_THREADS=1"
+Environment="OMP_NUM_THREADS=1"
+# Load the model in the gunicorn master before forking (--preload) so workers share it
+Environment="EMBEDDING_PRELOAD=blocking"
 ExecStart=/var/lib/thingdb/app/venv/bin/gunicorn \
     --bind 0.0.0.0:5000 \
     --certfile /var/lib/thingdb/ssl/cert.pem \
     --keyfile /var/lib/thingdb/ssl/key.pem \
     --workers 2 \
+    --preload \
     --timeout 600 \
     --access-logfile - \
     --error-logfile - \
@@ -116,9 +123,16 @@ User=thingdb
 Group=thingdb
 WorkingDirectory=/var/lib/thingdb/app
 Environment="PATH=/var/lib/thingdb/app/venv/bin:/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin"
+# One intra-op thread per process: the model is loaded in the gunicorn master, and
+# a multi-threaded OpenMP pool started there doesn't survive the fork into workers
+Environment="EMBEDDING_THREADS=1"
+Environment="OMP_NUM_THREADS=1"
+# Load the model in the gunicorn master before forking (--preload) so workers share it
+Environment="EMBEDDING_PRELOAD=blocking"
 ExecStart=/var/lib/thingdb/app/venv/bin/gunicorn \
     --bind 0.0.0.0:5000 \
     --workers 2 \
+    --preload \
     --timeout 600 \
     --access-logfile - \
     --error-logfile - \
@@ -159,6 +173,13 @@ needs_service_update() {
         return 0  # Needs update
     fi
     
+    # Check if the model is preloaded once before workers fork
+    if ! grep -q -- '--preload \\' /etc/systemd/system/thingdb.service 2>/dev/null || \
+       ! grep -q "EMBEDDING_PRELOAD=blocking" /etc/systemd/system/thingdb.service 2>/dev/null || \
+       ! grep -q "OMP_NUM_THREADS=1" /etc/systemd/system/thingdb.service 2>/dev/null; then
+        return 0  # Needs update
+    fi
+    
     # Check if using old Flask dev server
     if grep -q "thingdb serve" /etc/systemd/system/thingdb.service 2>/dev/null; then
         return 0  # Needs update (upgrade scenario)
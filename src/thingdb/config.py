@@ -11,27 +11,26 @@ MAX_CONTENT_LENGTH = 2 * 1024 * 1024 * 1024  # 2GB max file size (for large back
 # Database configuration - prioritize external PostgreSQL settings
 def get_db_config():
     """Get database configuration with fallbacks"""
+    env = os.environ
+    
     # Check for external PostgreSQL settings first
-    external_host = os.environ.get('EXTERNAL_POSTGRES_HOST')
+    external_host = env.get('EXTERNAL_POSTGRES_HOST')
     if external_host:
         return {
             'host': external_host,
-            'database': os.environ.get('EXTERNAL_POSTGRES_DB', 
-                                     'inventory_db'),
-            'user': os.environ.get('EXTERNAL_POSTGRES_USER', 
-                                 'inventory'),
-            'password': os.environ.get('EXTERNAL_POSTGRES_PASSWORD', 
-                                    'inventory_pass'),
-            'port': int(os.environ.get('EXTERNAL_POSTGRES_PORT', '5432'))
+            'database': env.get('EXTERNAL_POSTGRES_DB', 'inventory_db'),
+            'user': env.get('EXTERNAL_POSTGRES_USER', 'inventory'),
+            'password': env.get('EXTERNAL_POSTGRES_PASSWORD', 'inventory_pass'),
+            'port': int(env.get('EXTERNAL_POSTGRES_PORT', '5432'))
         }
     
     # Fallback to internal PostgreSQL settings
     return {
-        'host': os.environ.get('POSTGRES_HOST', 'localhost'),
-        'database': os.environ.get('POSTGRES_DB', 'thingdb'),
-        'user': os.environ.get('POSTGRES_USER', 'thingdb'),
-        'password': os.environ.get('POSTGRES_PASSWORD', 'thingdb_default_pass'),
-        'port': int(os.environ.get('POSTGRES_PORT', '5432'))
+        'host': env.get('POSTGRES_HOST', 'localhost'),
+        'database': env.get('POSTGRES_DB', 'thingdb'),
+        'user': env.get('POSTGRES_USER', 'thingdb'),
+        'password': env.get('POSTGRES_PASSWORD', 'thingdb_default_pass'),
+        'port': int(env.get('POSTGRES_PORT', '5432'))
     }
 
 # Initialize DB_CONFIG
@@ -46,9 +45,19 @@ CACHE_SETTINGS = {
     'image_cache': {
         'max_size': 50,
         'max_age': 900   # 15 minutes
+    },
+    'catalog_cache': {
+        'max_size': 16,
+        'max_age': 60    # Safety net; writes invalidate it through the catalog version
     }
 }
 
+# Compiled Jinja template cache, shared by all workers
+TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR', '/var/lib/thingdb/cache/jinja')
+
+# Shared by all worker processes to tell each other the catalog changed
+CATALOG_VERSION_FILE = os.environ.get('CATALOG_VERSION_FILE', '/var/lib/thingdb/cache/catalog_version')
+
 # Image processing settings
 IMAGE_STORAGE_METHOD = os.environ.get('IMAGE_STORAGE_METHOD', 'filesystem') # Always use filesystem
 IMAGE_DIR = os.environ.get('IMAGE_DIR', '/var/lib/thingdb/images')
@@ -57,14 +66,26 @@ IMAGE_SETTINGS = {
     'thumbnail_size': (200, 200),
     'preview_size': (800, 800),
     'max_file_size': MAX_CONTENT_LENGTH,
-    'allowed_extensions': {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    'allowed_extensions': frozenset({'png', 'jpg', 'jpeg', 'gif', 'webp'}),
 }
+# Dotted form for comparing against os.path.splitext results
+IMAGE_SETTINGS['allowed_suffixes'] = frozenset('.' + e for e in IMAGE_SETTINGS['allowed_extensions'])
 
 # Semantic search settings
 SEMANTIC_SEARCH = {
     'model_name': 'all-MiniLM-L6-v2',
+    # Output size of model_name; used to tell stored int8 blobs from float32 ones
+    'embedding_dimension': 384,
     'similarity_threshold': 0.15,
-    'max_results': 50
+    'max_results': 50,
+    # Unit-length embeddings let search score with a plain dot product
+    'normalize_embeddings': True,
+    # Stored embedding format: 'float32' or 'int8' (4x smaller, ~2 decimal digits of precision)
+    'embedding_storage': os.environ.get('EMBEDDING_STORAGE', 'float32'),
+    # When to load the model: 'blocking' (in create_app), 'background' (thread) or 'off' (first search)
+    'model_preload': os.environ.get('EMBEDDING_PRELOAD', 'background'),
+    # Torch threads per process for model.encode (0 = torch default of one per core)
+    'torch_threads': int(os.environ.get('EMBEDDING_THREADS', '0'))
 }
 
 # Flask app configuration
@@ -78,8 +99,6 @@ class Config:
 
 # Export Flask configuration as a dictionary
 FLASK_CONFIG = {
-    'MAX_CONTENT_LENGTH': MAX_CONTENT_LENGTH,
-    'SECRET_KEY': os.environ.get('SECRET_KEY') or 'dev-key-change-in-production',
-    'DEBUG': os.environ.get('FLASK_DEBUG', '1') == '1',
-    'TESTING': False
+    key: getattr(Config, key)
+    for key in ('MAX_CONTENT_LENGTH', 'SECRET_KEY', 'DEBUG', 'TESTING')
 }
\ No newline at end of file
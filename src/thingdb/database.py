@@ -1,31 +1,53 @@
 """
 Database connection and initialization for Flask Inventory Management System
 """
+import os
 import psycopg2
+from psycopg2 import extensions
 from thingdb.config import DB_CONFIG, IMAGE_STORAGE_METHOD
 
 # Connection pool for database connections
 _connection_pool = []
 _MAX_POOL_SIZE = 5
 
+def _reset_connection_pool():
+    """Forget connections inherited from the parent; their sockets belong to it"""
+    global _connection_pool
+    _connection_pool = []
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_connection_pool)
+
 def get_db_connection():
     """Get database connection from pool or create new one"""
-    global _connection_pool
-    
-    if _connection_pool:
+    while True:
         try:
             conn = _connection_pool.pop()
+        except IndexError:
+            break
+        try:
             # Test if connection is still alive
             conn.cursor().execute('SELECT 1')
             return conn
-        except:
-            pass
+        except psycopg2.Error:
+            conn.close()
     
     return psycopg2.connect(**DB_CONFIG)
 
 def return_db_connection(conn):
-    """Return connection to pool"""
-    global _connection_pool
+    """Return connection to pool
+
+    Any open transaction is rolled back first so a pooled connection never
+    sits idle in a transaction holding locks (restores drop every table).
+    """
+    if conn.closed:
+        return
+    try:
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+    except psycopg2.Error:
+        conn.close()
+        return
     
     if len(_connection_pool) < _MAX_POOL_SIZE:
         _connection_pool.append(conn)
@@ -67,7 +89,7 @@ def init_database():
     _add_column_if_not_exists(cursor, 'items', 'item_name', 'VARCHAR(255)')
     _add_column_if_not_exists(cursor, 'items', 'description', 'TEXT')
     _add_column_if_not_exists(cursor, 'items', 'parent_guid', 'VARCHAR(36) REFERENCES items(guid) ON DELETE SET NULL')
-    _add_column_if_not_exists(cursor, 'items', 'embedding_vector', 'TEXT')
+    _add_column_if_not_exists(cursor, 'items', 'embedding_vector', 'BYTEA')
     _add_column_if_not_exists(cursor, 'items', 'label_number', 'INTEGER')
     
     # Create sequence for label numbers if not exists
@@ -140,6 +162,10 @@ def init_database():
         )
     ''')
     
+    # Index the item foreign keys used for per-item image/text lookups and counts
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_images_item_guid ON images (item_guid)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_text_content_item_guid ON text_content (item_guid)')
+    
     # Record schema version if this is initial setup
     if current_version == 0:
         cursor.execute('''
@@ -149,6 +175,15 @@ def init_database():
         ''')
         print("[DEBUG] Schema version 1 recorded (initial setup)")
     
+    # Schema version 2: embeddings stored as packed float32 instead of JSON text.
+    # Checked against the live column type so restored older backups are migrated too.
+    _migrate_embeddings_to_binary(cursor)
+    cursor.execute('''
+        INSERT INTO _schema_version (version, description)
+        VALUES (2, 'Store embeddings as float32 BYTEA')
+        ON CONFLICT (version) DO NOTHING
+    ''')
+    
     conn.commit()
     conn.close()
 
@@ -163,6 +198,34 @@ def _add_column_if_not_exists(cursor, table_name, column_name, column_type):
     if not cursor.fetchone():
         cursor.execute(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}')
 
+def _migrate_embeddings_to_binary(cursor):
+    """Convert a legacy TEXT embedding_vector column (JSON) to float32 BYTEA"""
+    cursor.execute("""
+        SELECT data_type 
+        FROM information_schema.columns 
+        WHERE table_name = 'items' AND column_name = 'embedding_vector'
+    """)
+    column = cursor.fetchone()
+    if not column or column[0] == 'bytea':
+        return
+    
+    from thingdb.services.embedding_service import parse_embedding_from_db, pack_embedding
+    
+    cursor.execute('SELECT guid, embedding_vector FROM items WHERE embedding_vector IS NOT NULL')
+    stored_embeddings = cursor.fetchall()
+    
+    cursor.execute('ALTER TABLE items ALTER COLUMN embedding_vector TYPE BYTEA USING NULL')
+    
+    migrated_count = 0
+    for guid, embedding_json in stored_embeddings:
+        embedding = parse_embedding_from_db(embedding_json)
+        if embedding is not None:
+            cursor.execute('UPDATE items SET embedding_vector = %s WHERE guid = %s',
+                           (pack_embedding(embedding), guid))
+            migrated_count += 1
+    
+    print(f"[DEBUG] Migrated {migrated_count} embeddings to float32 storage")
+
 def get_pool_stats():
     """Get connection pool statistics"""
     return {
@@ -3,27 +3,38 @@ Main Flask application entry point
 Coordinates all modules and blueprints for the Inventory Management System
 """
 import os
+import re
+from functools import lru_cache
 from pathlib import Path
-from dotenv import load_dotenv
+
+# Possible locations for the .env file, in order of preference
+_ENV_PATHS = (
+    Path('/var/lib/thingdb/app/.env'),  # System deployment (production)
+    Path('.env'),  # Current directory (development)
+    Path('../.env'),  # One level up from src/
+)
+
 
 # Load environment variables BEFORE any other imports
 def load_env_file():
     """Load environment variables from .env file using python-dotenv"""
-    # Try multiple possible locations for .env file
-    possible_paths = [
-        Path('/var/lib/thingdb/app/.env'),  # System deployment (production)
-        Path('.env'),  # Current directory (development)
-        Path('../.env'),  # One level up from src/
-    ]
+    # A parent process (e.g. the reloader or a gunicorn master) already loaded it
+    if os.environ.get('THINGDB_ENV_LOADED') and not os.environ.get('FORCE_DOTENV'):
+        return False
+    
+    # Stop at the first location that holds a .env file
+    env_path = next((path for path in _ENV_PATHS if path.is_file()), None)
+    if env_path is None:
+        print("No .env file found, using system environment variables")
+        return False
     
-    for env_path in possible_paths:
-        if env_path.exists():
-            print(f"Loading environment from: {env_path}")
-            load_dotenv(env_path, override=True)
-            return True
+    from dotenv import load_dotenv
     
-    print("No .env file found, using system environment variables")
-    return False
+    print(f"Loading environment from: {env_path}")
+    # Variables already set in the real environment take precedence
+    load_dotenv(env_path, override=False)
+    os.environ['THINGDB_ENV_LOADED'] = '1'
+    return True
 
 
 # Load environment variables early
@@ -32,10 +43,12 @@ load_env_file()
 
 # Now import modules that depend on environment variables
 from flask import Flask, render_template, request, jsonify
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
 from thingdb import config
 from thingdb.database import init_database
-from thingdb.models import image_cache, thumbnail_cache
-from thingdb.services.embedding_service import initialize_embedding_model
+from thingdb.models import bump_catalog_version
+from thingdb.services.embedding_service import initialize_embedding_model, preload_embedding_model_in_background
 
 # Import all blueprints
 from thingdb.routes.core_routes import core_bp
@@ -48,6 +61,43 @@ from thingdb.routes.admin_routes import admin_bp
 from thingdb.routes.backup_routes import backup_bp
 from thingdb.routes.scanner_routes import scanner_bp
 
+# Headers added to every response
+_SECURITY_HEADERS = (
+    ('X-Content-Type-Options', 'nosniff'),
+    ('X-Frame-Options', 'SAMEORIGIN'),
+)
+
+# Headers added to dynamic responses that don't set their own caching policy
+_NO_CACHE_HEADERS = (
+    ('Cache-Control', 'no-cache, no-store, must-revalidate'),
+    ('Pragma', 'no-cache'),
+    ('Expires', '0'),
+)
+
+# Image endpoints set no-cache with an ETag themselves so browsers can revalidate
+_REVALIDATED_ENDPOINTS = frozenset({'image.serve_image', 'image.serve_thumbnail', 'image.serve_original'})
+
+# Request methods that never change the catalog
+_SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+# Blueprints whose writes change items shown in the cached listings; restores
+# and resets bump the catalog version themselves when they finish
+_CATALOG_BLUEPRINTS = frozenset({'core', 'item', 'image', 'relationship', 'scanner'})
+
+# Pattern to match URLs for the urlize_safe template filter
+_URL_PATTERN = re.compile(r'(https?://[^\s<>"{}|\\^`\[\]]+)')
+
+
+def _make_link(match):
+    """Render a matched URL as a link that opens in a new tab"""
+    url = match.group(1)
+    return f'<a href="{url}" target="_blank" rel="noopener noreferrer">{url}</a>'
+
+
+@lru_cache(maxsize=1024)
+def _urlize(text):
+    """Link URLs in text; memoized since list pages render the same fields repeatedly"""
+    return Markup(_URL_PATTERN.sub(_make_link, text))
+
 
 def create_app():
     """Create and configure the Flask application"""
@@ -56,12 +106,24 @@ def create_app():
     # Configure Flask
     app.config.update(config.FLASK_CONFIG)
     
+    # Share compiled templates across workers and restarts
+    try:
+        os.makedirs(config.TEMPLATE_CACHE_DIR, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(config.TEMPLATE_CACHE_DIR)
+    except OSError as e:
+        print(f"[WARNING] Template bytecode cache disabled: {e}")
+    
     # Initialize database
     init_database()
     
-    # Pre-load embedding model to avoid cold start delays
-    print("Pre-loading embedding model...")
-    initialize_embedding_model()
+    # Pre-load embedding model to avoid cold start delays on the first search
+    model_preload = config.SEMANTIC_SEARCH.get('model_preload', 'background')
+    if model_preload == 'blocking':
+        print("Pre-loading embedding model...")
+        initialize_embedding_model()
+    elif model_preload == 'background':
+        print("Pre-loading embedding model in the background...")
+        preload_embedding_model_in_background()
     
     # Register blueprints
     app.register_blueprint(core_bp)
@@ -75,6 +137,15 @@ def create_app():
     app.register_blueprint(scanner_bp)
     
     # Error handlers
+    error_pages = {}
+    
+    def render_error_page(heading, message):
+        """Render a static error page once and reuse the HTML (cheap under 404 floods)"""
+        key = (heading, message)
+        if key not in error_pages:
+            error_pages[key] = render_template('error.html', heading=heading, message=message)
+        return error_pages[key]
+    
     @app.errorhandler(404)
     def not_found(error):
         # Return JSON for API endpoints, HTML for web pages
@@ -83,15 +154,13 @@ def create_app():
                 'success': False,
                 'error': 'Endpoint not found'
             }), 404
-        return render_template('error.html',
-                             heading='❌ Page Not Found',
-                             message='The requested page could not be found.'), 404
+        return render_error_page('❌ Page Not Found',
+                                 'The requested page could not be found.'), 404
     
     @app.errorhandler(500)
     def internal_error(error):
-        return render_template('error.html',
-                             heading='❌ Internal Server Error',
-                             message='An internal server error occurred. Please try again later.'), 500
+        return render_error_page('❌ Internal Server Error',
+                                 'An internal server error occurred. Please try again later.'), 500
     
     # Custom template filters
     @app.template_filter('urlize_safe')
@@ -100,45 +169,46 @@ def create_app():
         if not text:
             return text
         
-        import re
-        from markupsafe import Markup
-        
-        # Pattern to match URLs
-        url_pattern = r'(https?://[^\s<>"{}|\\^`\[\]]+)'
-        
-        def make_link(match):
-            url = match.group(1)
-            return f'<a href="{url}" target="_blank" rel="noopener noreferrer">{url}</a>'
+        # Most fields have no links; skip the regex and the cache for them
+        if 'http' not in text:
+            return Markup(text)
         
         # Replace URLs with clickable links
-        result = re.sub(url_pattern, make_link, text)
-        return Markup(result)
+        return _urlize(text)
     
     # Template context processors
+    version_context = {
+        'app_version': config.APP_VERSION,
+        'app_rc': config.APP_RELEASE_CANDIDATE
+    }
+    
     @app.context_processor
     def inject_version():
-        return {
-            'app_version': config.APP_VERSION,
-            'app_rc': config.APP_RELEASE_CANDIDATE
-        }
+        return version_context
     
-    @app.context_processor
-    def inject_cache_stats():
-        return {
-            'cache_stats': {
-                'images': len(image_cache.cache),
-                'thumbnails': len(thumbnail_cache.cache)
-            }
-        }
+    # A successful item write may rename, add, move or re-image items, so drop
+    # the cached item listings in every worker
+    @app.after_request
+    def invalidate_catalog_cache(response):
+        if (request.method not in _SAFE_METHODS and response.status_code < 400
+                and request.blueprint in _CATALOG_BLUEPRINTS):
+            bump_catalog_version()
+        return response
     
     # Add security and cache control headers
     @app.after_request
     def add_security_headers(response):
-        response.headers['X-Content-Type-Options'] = 'nosniff'
-        response.headers['X-Frame-Options'] = 'SAMEORIGIN'
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
+        headers = response.headers
+        for name, value in _SECURITY_HEADERS:
+            headers[name] = value
+        
+        # Static files and images keep their own Cache-Control; everything else,
+        # including ETag-carrying backup downloads, stays no-store
+        if request.endpoint == 'static' or request.endpoint in _REVALIDATED_ENDPOINTS:
+            return response
+        
+        for name, value in _NO_CACHE_HEADERS:
+            headers[name] = value
         return response
     
     return app
@@ -149,9 +219,9 @@ app = create_app()
 
 if __name__ == '__main__':
     print(f"Starting Flask Inventory Management System v{config.APP_VERSION}")
-    print("Available routes:")
-    for rule in app.url_map.iter_rules():
-        print(f"  {rule.endpoint:30} {rule.rule}")
+    if os.environ.get('THINGDB_PRINT_ROUTES'):
+        print("Available routes:")
+        print('\n'.join(f"  {rule.endpoint:30} {rule.rule}" for rule in app.url_map.iter_rules()))
     
     app.run(
         debug=config.FLASK_CONFIG.get('DEBUG', True),
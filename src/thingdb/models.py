@@ -1,9 +1,10 @@
 """
 Data models and cache classes for Flask Inventory Management System
 """
+import os
 import time
 from collections import OrderedDict
-from thingdb.config import CACHE_SETTINGS
+from thingdb.config import CACHE_SETTINGS, CATALOG_VERSION_FILE
 
 class ImageCache:
     """In-memory LRU cache for images with TTL expiration"""
@@ -16,6 +17,11 @@ class ImageCache:
         self.misses = 0
         self.requests = 0
     
+    @property
+    def size(self):
+        """Number of entries currently cached"""
+        return len(self.cache)
+    
     def get(self, key):
         """Get item from cache if it exists and hasn't expired"""
         self.requests += 1
@@ -61,6 +67,51 @@ image_cache = ImageCache(
     max_age=CACHE_SETTINGS['image_cache']['max_age']
 )
 
+# Item listings (home page, tree view), keyed by catalog version
+catalog_cache = ImageCache(
+    max_size=CACHE_SETTINGS['catalog_cache']['max_size'],
+    max_age=CACHE_SETTINGS['catalog_cache']['max_age']
+)
+
+# Bumped on every local write, so this worker's own changes show up even when
+# CATALOG_VERSION_FILE can't be written
+_catalog_generation = 0
+_catalog_version_error_logged = False
+
+def get_catalog_version():
+    """Current catalog version as seen by this and every other worker process
+
+    bump_catalog_version sets CATALOG_VERSION_FILE's mtime to a new nanosecond
+    value, so one stat call is enough to notice another worker's write and the
+    file itself stays empty. If the file is missing or unwritable, other workers
+    fall back to the catalog_cache max_age.
+    """
+    try:
+        stat = os.stat(CATALOG_VERSION_FILE)
+        file_version = (stat.st_ino, stat.st_mtime_ns)
+    except OSError:
+        file_version = None
+    return (_catalog_generation, file_version)
+
+def bump_catalog_version():
+    """Invalidate cached item listings in all workers after a write"""
+    global _catalog_generation, _catalog_version_error_logged
+    _catalog_generation += 1
+    try:
+        try:
+            previous = os.stat(CATALOG_VERSION_FILE).st_mtime_ns
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(CATALOG_VERSION_FILE), exist_ok=True)
+            open(CATALOG_VERSION_FILE, 'ab').close()
+            previous = 0
+        # Always move forward, even if the clock hasn't ticked since the last bump
+        version = max(time.time_ns(), previous + 1)
+        os.utime(CATALOG_VERSION_FILE, ns=(version, version))
+    except OSError as e:
+        if not _catalog_version_error_logged:
+            print(f"[ERROR] Failed to update catalog version (further errors not logged): {e}")
+            _catalog_version_error_logged = True
+
 # Data structures for type hints and documentation
 class ItemData:
     """Structure for item database records"""
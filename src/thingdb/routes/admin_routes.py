@@ -10,10 +10,10 @@ from thingdb.database import get_db_connection, get_connection_pool_info
 from thingdb.models import image_cache, thumbnail_cache
 from thingdb.services.embedding_service import (
     is_embedding_model_available,
-    generate_embedding,
+    generate_embeddings_batch,
+    pack_embedding,
     get_cache_info
 )
-from thingdb.services.qr_pdf_service import qr_pdf_service
 from thingdb.config import APP_VERSION, APP_RELEASE_CANDIDATE, IMAGE_STORAGE_METHOD, IMAGE_DIR
 
 admin_bp = Blueprint('admin', __name__)
@@ -68,8 +68,8 @@ def system_status():
         
         # Get cache stats
         cache_stats = {
-            'image_cache_size': len(image_cache.cache),
-            'thumbnail_cache_size': len(thumbnail_cache.cache),
+            'image_cache_size': image_cache.size,
+            'thumbnail_cache_size': thumbnail_cache.size,
             'image_cache_max': image_cache.max_size,
             'thumbnail_cache_max': thumbnail_cache.max_size
         }
@@ -331,7 +331,7 @@ def cache_statistics():
     try:
         stats = {
             'image_cache': {
-                'size': len(image_cache.cache),
+                'size': image_cache.size,
                 'max_size': image_cache.max_size,
                 'max_age': image_cache.max_age,
                 'hit_ratio': getattr(image_cache, 'hits', 0) / max(getattr(image_cache, 'requests', 1), 1),
@@ -339,7 +339,7 @@ def cache_statistics():
                 'misses': getattr(image_cache, 'misses', 0)
             },
             'thumbnail_cache': {
-                'size': len(thumbnail_cache.cache),
+                'size': thumbnail_cache.size,
                 'max_size': thumbnail_cache.max_size,
                 'max_age': thumbnail_cache.max_age,
                 'hit_ratio': getattr(thumbnail_cache, 'hits', 0) / max(getattr(thumbnail_cache, 'requests', 1), 1),
@@ -395,8 +395,8 @@ def system_metrics():
             'disk_free_gb': disk.free / (1024**3),
             'active_db_connections': active_connections,
             'cache_sizes': {
-                'image_cache': len(image_cache.cache),
-                'thumbnail_cache': len(thumbnail_cache.cache)
+                'image_cache': image_cache.size,
+                'thumbnail_cache': thumbnail_cache.size
             },
             'embedding_model_available': is_embedding_model_available()
         }
@@ -423,47 +423,33 @@ def api_reindex_embeddings():
         items_to_update = cursor.fetchall()
         print(f"[DEBUG] Found {len(items_to_update)} items to process")
         
-        updated_count = 0
+        # Build the text for every item first so the model can encode them in batches
+        combined_texts = []
         for guid, name, description in items_to_update:
+            # Get all categories for this item
+            cursor.execute('SELECT category_name FROM categories WHERE item_guid = %s', (guid,))
+            categories = cursor.fetchall()
+            category_text = " ".join([cat[0] for cat in categories])
+
+            # Combine name, description, and categories
+            combined_texts.append(f"{name or ''} {description or ''} {category_text}".strip())
+
+        print(f"[DEBUG] Generating embeddings for {len(combined_texts)} items in batches...")
+        embeddings = generate_embeddings_batch(combined_texts)
+
+        updated_count = 0
+        for (guid, name, description), embedding in zip(items_to_update, embeddings):
             try:
-                # Get all categories for this item
-                cursor.execute('SELECT category_name FROM categories WHERE item_guid = %s', (guid,))
-                categories = cursor.fetchall()
-                category_text = " ".join([cat[0] for cat in categories])
-                
-                # Combine name, description, and categories
-                combined_text = f"{name or ''} {description or ''} {category_text}".strip()
-                print(f"[DEBUG] Processing item {guid[:8]}...")
-                print(f"[DEBUG]   Name: '{name}'")
-                print(f"[DEBUG]   Description: '{description}'")
-                print(f"[DEBUG]   Categories: '{category_text}'")
-                print(f"[DEBUG]   Combined: '{combined_text}'")
-                
-                if combined_text:
-                    # Generate embedding
-                    print(f"[DEBUG]   Generating embedding for: '{combined_text[:50]}...'")
-                    embedding = generate_embedding(combined_text)
-                    print(f"[DEBUG]   Embedding generated: {embedding is not None}")
-                    
-                    if embedding is not None:
-                        # Convert to JSON format
-                        if hasattr(embedding, 'tolist'):
-                            embedding_list = embedding.tolist()
-                        else:
-                            embedding_list = list(embedding)
-                        
-                        import json
-                        embedding_json = json.dumps(embedding_list)
-                        
-                        # Update the item
-                        print(f"[DEBUG]   Updating database for {guid[:8]}...")
-                        cursor.execute(
-                            'UPDATE items SET embedding_vector = %s, updated_date = CURRENT_TIMESTAMP WHERE guid = %s',
-                            (embedding_json, guid)
-                        )
-                        updated_count += 1
-                        print(f"[DEBUG]   ✅ Updated! ({updated_count} total)")
-                        
+                if embedding is not None:
+                    embedding_blob = pack_embedding(embedding)
+
+                    # Update the item
+                    cursor.execute(
+                        'UPDATE items SET embedding_vector = %s, updated_date = CURRENT_TIMESTAMP WHERE guid = %s',
+                        (embedding_blob, guid)
+                    )
+                    updated_count += 1
+
             except Exception as e:
                 print(f"[DEBUG] ❌ Error processing {name}: {e}")
                 continue
@@ -724,6 +710,7 @@ def generate_qr_sheet():
     """Generate and download QR code PDF sheet"""
     try:
         from flask import send_file
+        from thingdb.services.qr_pdf_service import qr_pdf_service
         
         # Generate PDF
         pdf_buffer, guids = qr_pdf_service.generate_qr_sheet()
@@ -753,6 +740,30 @@ def generate_qr_sheet():
 # All package management routes (upload, install, rollback) have been removed
 # Users should install/update with: pip install -e . (or from PyPI when published)
 
+def _safe_extract_tar(tar, path):
+    """Extract a tar archive member by member, rejecting paths that escape the target"""
+    import tarfile
+    if hasattr(tarfile, 'data_filter'):
+        # Python 3.12+ (and security backports): block absolute paths, links out, devices
+        tar.extraction_filter = tarfile.data_filter
+        for member in tar:
+            tar.extract(member, path)
+        return
+
+    root = os.path.realpath(path)
+    for member in tar:
+        target = os.path.realpath(os.path.join(root, member.name))
+        if target != root and not target.startswith(root + os.sep):
+            raise Exception(f"Unsafe path in archive: {member.name}")
+        if member.issym() or member.islnk():
+            link_base = os.path.dirname(target) if member.issym() else root
+            link_target = os.path.realpath(os.path.join(link_base, member.linkname))
+            if not link_target.startswith(root + os.sep):
+                raise Exception(f"Unsafe link in archive: {member.name}")
+        elif not (member.isfile() or member.isdir()):
+            continue  # Skip devices and FIFOs
+        tar.extract(member, path)
+
 # @admin_bp.route('/api/test-package-upload', methods=['GET'])
 def api_test_package_upload():
     """Test route to verify package upload functionality is working"""
@@ -914,7 +925,7 @@ def api_install_package():
         # Extract the inner package from the bundle
         temp_extract_dir = Path(tempfile.mkdtemp(prefix="inventory_install_"))
         with tarfile.open(bundle_path, 'r:gz') as bundle_tar:
-            bundle_tar.extractall(path=temp_extract_dir)
+            _safe_extract_tar(bundle_tar, temp_extract_dir)
         
         # Find the actual source tar.gz inside the bundle
         package_files = list(temp_extract_dir.glob('*.tar.gz'))
@@ -929,7 +940,7 @@ def api_install_package():
         temp_src_dir = Path(tempfile.mkdtemp(prefix="inventory_src_"))
         logger.info(f"Extracting source package to: {temp_src_dir}")
         with tarfile.open(source_package_path, 'r:gz') as src_tar:
-            src_tar.extractall(path=temp_src_dir)
+            _safe_extract_tar(src_tar, temp_src_dir)
         
         # The package contains a 'src' directory.
         new_app_path = temp_src_dir / 'src'
@@ -1066,7 +1077,7 @@ def api_install_unsigned_package():
         # Extract the inner package from the bundle
         temp_extract_dir = Path(tempfile.mkdtemp(prefix="inventory_install_"))
         with tarfile.open(temp_package_path, 'r:gz') as bundle_tar:
-            bundle_tar.extractall(path=temp_extract_dir)
+            _safe_extract_tar(bundle_tar, temp_extract_dir)
         
         # Find the actual source tar.gz inside the bundle
         package_files = list(temp_extract_dir.glob('*.tar.gz'))
@@ -1081,7 +1092,7 @@ def api_install_unsigned_package():
         temp_src_dir = Path(tempfile.mkdtemp(prefix="inventory_src_"))
         logger.info(f"Extracting source package to: {temp_src_dir}")
         with tarfile.open(source_package_path, 'r:gz') as src_tar:
-            src_tar.extractall(path=temp_src_dir)
+            _safe_extract_tar(src_tar, temp_src_dir)
         
         # The package contains a 'src' directory.
         new_app_path = temp_src_dir / 'src'
@@ -3,7 +3,10 @@ Backup and Restore routes for Flask Inventory Management System
 Handles database and filesystem backup/restore operations
 """
 import os
+import re
 import json
+import fcntl
+import mmap
 import shutil
 import subprocess
 import tempfile
@@ -11,27 +14,117 @@ import zipfile
 import signal
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from flask import Blueprint, jsonify, request, send_file, render_template
 from thingdb.database import get_db_connection, DB_CONFIG
 from thingdb.config import IMAGE_DIR, IMAGE_STORAGE_METHOD
+from thingdb.models import bump_catalog_version
 
 backup_bp = Blueprint('backup', __name__)
 
 # Backup configuration
 BACKUP_DIR = '/var/lib/thingdb/backups'
+# zlib level for backup archives: 3 is roughly twice as fast as the default 6
+# for a few percent larger files; raise it for archival copies
+BACKUP_COMPRESSION_LEVEL = int(os.environ.get('THINGDB_BACKUP_ZLEVEL', '3'))
+# Already-compressed image formats are stored as-is rather than deflated again
+PRECOMPRESSED_SUFFIXES = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic'})
+# Database dump format inside backups: 'custom' (compressed by pg_dump, restored
+# in parallel by pg_restore) or 'plain' (SQL text that any psql can replay)
+BACKUP_DB_FORMAT = os.environ.get('THINGDB_BACKUP_DB_FORMAT', 'custom')
+# Parallel jobs for pg_restore of custom-format dumps
+RESTORE_JOBS = min(os.cpu_count() or 1, 4)
+# pg_restore's summary when it finished despite failed statements
+_PG_RESTORE_IGNORED_ERRORS = 'errors ignored on restore'
+# Session settings for restore connections: a restore is redone from the archive
+# if it fails, so commits needn't wait for WAL flushes; one CHECKPOINT runs at the end
+RESTORE_MAINTENANCE_WORK_MEM = os.environ.get('THINGDB_RESTORE_WORK_MEM', '256MB')
+RESTORE_PGOPTIONS = f'-c synchronous_commit=off -c maintenance_work_mem={RESTORE_MAINTENANCE_WORK_MEM}'
+# Connection arguments and environment for the PostgreSQL command-line tools,
+# built from DB_CONFIG so backups use the same (possibly external) database as the app
+_PG_DB_NAME = DB_CONFIG['database']
+_PG_CONN_ARGS = (
+    '--host', DB_CONFIG['host'],
+    '--port', str(DB_CONFIG['port']),
+    '--username', DB_CONFIG['user'],
+    '--dbname', _PG_DB_NAME,
+    '--no-password',
+)
+_PG_ENV = {**os.environ, 'PGPASSWORD': DB_CONFIG['password']}
+# Bulk-load settings apply to every restore connection, including pg_restore's workers
+_PG_RESTORE_ENV = {**_PG_ENV, 'PGOPTIONS': RESTORE_PGOPTIONS}
+# Drop every table in the public schema with one DROP statement, so tables added
+# by later schema versions are included without listing them here
+_DROP_TABLES_SQL = '''
+    DO $$
+    DECLARE
+        drop_stmt text;
+    BEGIN
+        SELECT 'DROP TABLE IF EXISTS ' || string_agg(format('%%I', tablename), ', ') || ' CASCADE'
+        INTO drop_stmt
+        FROM pg_tables
+        WHERE schemaname = 'public'%s;
+        IF drop_stmt IS NOT NULL THEN
+            EXECUTE drop_stmt;
+        END IF;
+    END $$;
+'''
+_DROP_ALL_TABLES = _DROP_TABLES_SQL % ''
+# A restore keeps _schema_version; the dump's own --clean drop handles it when present
+_DROP_DATA_TABLES = _DROP_TABLES_SQL % " AND tablename <> '_schema_version'"
+# Database-level commands that must not run when restoring into the current database
+_SQL_DATABASE_COMMAND = re.compile(rb'DROP DATABASE|CREATE DATABASE|\\connect')
+# A line with one of those commands plus the following lines up to the next 'SET '
+_SQL_DATABASE_BLOCK = re.compile(
+    rb'^[^\n]*(?:DROP DATABASE|CREATE DATABASE|\\connect)[^\n]*(?:\n|\Z)'
+    rb'(?:(?![^\n]*SET )[^\n]*\n)*(?:(?![^\n]*SET )[^\n]+\Z)?',
+    re.MULTILINE
+)
+# Seconds to reuse database size/count stats between backup status polls
+DATABASE_STATS_TTL = 5
+_database_stats_cache = (0, None)
+# Threads used to remove image files in parallel during restore and reset
+FILE_IO_WORKERS = 8
+# Progress of the background restore. It is mirrored to a file so the status
+# endpoint gives the same answer from every gunicorn worker.
+RESTORE_STATUS_FILE = os.path.join(BACKUP_DIR, '.restore_status.json')
+_RESTORE_RUNNING_PHASES = frozenset({'extract', 'db_restore', 'image_restore'})
+_restore_state = {'phase': 'idle'}
+_restore_lock = threading.RLock()
+# Held with flock for the whole restore, so two workers can't both pass the
+# status check; the kernel drops it if the holding worker dies
+RESTORE_LOCK_FILE = os.path.join(BACKUP_DIR, '.restore.lock')
 
 
 @backup_bp.route('/backup')
 def backup_page():
     """Backup management page"""
     return render_template('backup.html')
-ALLOWED_EXTENSIONS = {'zip', 'sql', 'tar', 'gz'}
+ALLOWED_EXTENSIONS = frozenset({'zip', 'sql', 'tar', 'gz'})
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
-    return ('.' in filename and 
-            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS)
+    _, dot, extension = filename.rpartition('.')
+    return bool(dot) and extension.lower() in ALLOWED_EXTENSIONS
+
+
+def parallel_rmtree(path, workers=FILE_IO_WORKERS):
+    """Remove a directory tree, unlinking files from a thread pool"""
+    files = []
+    dirs = []
+    for root, dirnames, filenames in os.walk(path, topdown=False):
+        files.extend(os.path.join(root, f) for f in filenames)
+        # Symlinked directories are unlinked like files, not descended into
+        files.extend(os.path.join(root, d) for d in dirnames if os.path.islink(os.path.join(root, d)))
+        dirs.append(root)
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(os.remove, files))
+    
+    # Bottom-up order, so each directory is empty by the time it is removed
+    for directory in dirs:
+        os.rmdir(directory)
 
 
 def ensure_backup_dir():
@@ -39,12 +132,122 @@ def ensure_backup_dir():
     os.makedirs(BACKUP_DIR, exist_ok=True)
     return BACKUP_DIR
 
+def update_restore_status(**changes):
+    """Merge changes into the restore status and save it for the other workers"""
+    with _restore_lock:
+        _restore_state.update(changes)
+        try:
+            ensure_backup_dir()
+            temp_path = f"{RESTORE_STATUS_FILE}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(_restore_state, f)
+            os.replace(temp_path, RESTORE_STATUS_FILE)
+        except OSError as e:
+            print(f"[ERROR] Failed to save restore status: {e}")
+
+def read_restore_status():
+    """Return the latest restore status saved by any worker"""
+    try:
+        with open(RESTORE_STATUS_FILE, 'r') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {'phase': 'idle'}
+    
+    # A worker that died mid-restore leaves a running phase behind
+    if state.get('phase') in _RESTORE_RUNNING_PHASES and not _process_alive(state.get('pid')):
+        state.update(phase='failed', error='Restore was interrupted')
+    return state
+
+def _process_alive(pid):
+    """Check whether a process with this pid still exists"""
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Exists but belongs to another user
+    return True
+
+def start_restore(zip_path, source, cleanup=None):
+    """Run restore_from_zip on a background thread
+
+    zip_path may be a path or an open file. Returns False without starting if a
+    restore is already running. cleanup, if given, is called once the restore
+    has finished.
+    """
+    with _restore_lock:
+        ensure_backup_dir()
+        lock_file = open(RESTORE_LOCK_FILE, 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        update_restore_status(phase='extract', source=source, error=None, pid=os.getpid(),
+                              started=datetime.now().isoformat(), finished=None)
+    
+    def do_restore():
+        try:
+            try:
+                restore_success = restore_from_zip(zip_path)
+            finally:
+                if cleanup:
+                    cleanup()
+                # Even a failed restore may have replaced some of the data
+                bump_catalog_version()
+            
+            if restore_success:
+                update_restore_status(phase='done', finished=datetime.now().isoformat())
+            else:
+                update_restore_status(phase='failed', error='Failed to restore backup',
+                                      finished=datetime.now().isoformat())
+        finally:
+            lock_file.close()
+        
+        if restore_success:
+            restart_application()
+    
+    restore_thread = threading.Thread(target=do_restore)
+    restore_thread.daemon = True
+    try:
+        restore_thread.start()
+    except Exception:
+        lock_file.close()
+        update_restore_status(phase='failed', error='Failed to start restore',
+                              finished=datetime.now().isoformat())
+        raise
+    return True
+
 
 def get_backup_filename(prefix="backup"):
     """Generate backup filename with timestamp"""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     return f"{prefix}_{timestamp}"
 
+def get_database_stats():
+    """Return (size, item count, image count), cached briefly since the backup page polls it"""
+    global _database_stats_cache
+    cached_at, stats = _database_stats_cache
+    if stats is not None and time.time() - cached_at < DATABASE_STATS_TTL:
+        return stats
+    
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT pg_size_pretty(pg_database_size(current_database())),
+                   (SELECT COUNT(*) FROM items),
+                   (SELECT COUNT(*) FROM images)
+        ''')
+        stats = cursor.fetchone()
+    finally:
+        conn.close()
+    
+    _database_stats_cache = (time.time(), stats)
+    return stats
+
 @backup_bp.route('/api/backup/status')
 def backup_status():
     """Get backup status and available backups"""
@@ -53,30 +256,22 @@ def backup_status():
         
         # Get list of existing backups
         backups = []
-        for filename in os.listdir(BACKUP_DIR):
-            if filename.endswith('.zip'):
-                filepath = os.path.join(BACKUP_DIR, filename)
-                stat = os.stat(filepath)
-                backups.append({
-                    'filename': filename,
-                    'size': stat.st_size,
-                    'created': datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                    'size_human': format_file_size(stat.st_size)
-                })
+        with os.scandir(BACKUP_DIR) as entries:
+            for entry in entries:
+                if entry.name.endswith('.zip') and entry.is_file():
+                    stat = entry.stat()
+                    backups.append({
+                        'filename': entry.name,
+                        'size': stat.st_size,
+                        'created': datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                        'size_human': format_file_size(stat.st_size)
+                    })
         
         # Sort by creation time (newest first)
         backups.sort(key=lambda x: x['created'], reverse=True)
         
         # Get database info
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT pg_size_pretty(pg_database_size(current_database()))")
-        db_size = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM items")
-        item_count = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM images")
-        image_count = cursor.fetchone()[0]
-        conn.close()
+        db_size, item_count, image_count = get_database_stats()
         
         # Get current upload limit from Flask config
         from flask import current_app
@@ -111,27 +306,39 @@ def create_backup():
         backup_name = get_backup_filename()
         backup_path = os.path.join(BACKUP_DIR, f"{backup_name}.zip")
         
-        # Create temporary directory for backup files
-        with tempfile.TemporaryDirectory() as temp_dir:
-            db_file = os.path.join(temp_dir, "database.sql")
-            images_dir = os.path.join(temp_dir, "images")
-            
-            # 1. Backup PostgreSQL database
+        if BACKUP_DB_FORMAT == 'custom':
+            # pg_dump already compresses custom archives, so don't deflate again
+            db_entry = zipfile.ZipInfo('database.dump', date_time=time.localtime()[:6])
+            db_entry.compress_type = zipfile.ZIP_STORED
+            db_entry.external_attr = 0o644 << 16
+        else:
+            # Opened by name so the entry takes the archive's BACKUP_COMPRESSION_LEVEL;
+            # a hand-built ZipInfo would deflate at zlib's default level
+            db_entry = 'database.sql'
+        
+        with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True,
+                             compresslevel=BACKUP_COMPRESSION_LEVEL) as zipf:
             print(f"Creating database backup...")
-            db_backup_success = create_database_backup(db_file)
-            if not db_backup_success:
-                return jsonify({
-                    'success': False,
-                    'error': 'Failed to create database backup'
-                }), 500
-            
-            # 2. Backup image files (if using filesystem storage)
-            if IMAGE_STORAGE_METHOD == 'filesystem':
-                print(f"Creating filesystem backup...")
-                if os.path.exists(IMAGE_DIR):
-                    shutil.copytree(IMAGE_DIR, images_dir)
-                else:
-                    os.makedirs(images_dir)
+            if IMAGE_STORAGE_METHOD == 'filesystem' and os.path.exists(IMAGE_DIR):
+                # 1. pg_dump waits on the database while archiving images waits on the
+                # local disk, so spool the dump in the background and add it afterwards
+                with tempfile.TemporaryFile(dir=BACKUP_DIR) as dump_file, \
+                        ThreadPoolExecutor(max_workers=1) as executor:
+                    dump_future = executor.submit(create_database_backup, dump_file, BACKUP_DB_FORMAT)
+                    
+                    # 2. Backup image files
+                    print(f"Creating filesystem backup...")
+                    write_images_to_zip(zipf)
+                    
+                    db_backup_success = dump_future.result()
+                    if db_backup_success:
+                        dump_file.seek(0)
+                        with zipf.open(db_entry, 'w', force_zip64=True) as db_file:
+                            shutil.copyfileobj(dump_file, db_file, 1024 * 1024)
+            else:
+                # 1. Backup PostgreSQL database straight into the archive
+                with zipf.open(db_entry, 'w', force_zip64=True) as db_file:
+                    db_backup_success = create_database_backup(db_file, BACKUP_DB_FORMAT)
             
             # 3. Create metadata file
             metadata = {
@@ -145,29 +352,25 @@ def create_backup():
                 'storage_method': IMAGE_STORAGE_METHOD,
                 'image_dir': IMAGE_DIR if IMAGE_STORAGE_METHOD == 'filesystem' else None
             }
-            
-            with open(os.path.join(temp_dir, "metadata.json"), 'w') as f:
-                json.dump(metadata, f, indent=2)
-            
-            # 4. Create ZIP archive
-            print(f"Creating ZIP archive...")
-            with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(temp_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arc_name = os.path.relpath(file_path, temp_dir)
-                        zipf.write(file_path, arc_name)
-            
-            # Get backup size
-            backup_size = os.path.getsize(backup_path)
-            
+            zipf.writestr('metadata.json', json.dumps(metadata, indent=2))
+        
+        if not db_backup_success:
+            os.remove(backup_path)
             return jsonify({
-                'success': True,
-                'message': 'Backup created successfully',
-                'backup_file': f"{backup_name}.zip",
-                'backup_size': format_file_size(backup_size),
-                'backup_path': backup_path
-            })
+                'success': False,
+                'error': 'Failed to create database backup'
+            }), 500
+        
+        # Get backup size
+        backup_size = os.path.getsize(backup_path)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Backup created successfully',
+            'backup_file': f"{backup_name}.zip",
+            'backup_size': format_file_size(backup_size),
+            'backup_path': backup_path
+        })
             
     except Exception as e:
         return jsonify({
@@ -175,44 +378,53 @@ def create_backup():
             'error': str(e)
         }), 500
 
-def create_database_backup(db_file):
-    """Create PostgreSQL database backup"""
+def write_images_to_zip(zipf):
+    """Add every file under IMAGE_DIR to an open backup archive under images/"""
+    # Slice off the image dir prefix instead of calling relpath per file
+    prefix_len = len(os.path.join(IMAGE_DIR, ''))
+    for root, dirs, files in os.walk(IMAGE_DIR):
+        for file in files:
+            file_path = os.path.join(root, file)
+            arc_name = 'images/' + file_path[prefix_len:]
+            if os.path.splitext(file)[1].lower() in PRECOMPRESSED_SUFFIXES:
+                compress_type = zipfile.ZIP_STORED
+            else:
+                compress_type = zipfile.ZIP_DEFLATED
+            zipf.write(file_path, arc_name, compress_type=compress_type,
+                       compresslevel=BACKUP_COMPRESSION_LEVEL)
+
+def create_database_backup(output, dump_format='plain'):
+    """Stream a PostgreSQL database backup ('plain' SQL or 'custom' archive) into a binary file object"""
     try:
-        # Get database config from environment variables (same as config.py)
-        db_host = os.environ.get('POSTGRES_HOST', 'localhost')
-        db_port = os.environ.get('POSTGRES_PORT', '5432')
-        db_user = os.environ.get('POSTGRES_USER', 'thingdb')
-        db_password = os.environ.get('POSTGRES_PASSWORD', 'thingdb_default_pass')
-        db_name = os.environ.get('POSTGRES_DB', 'thingdb')
-        
-        # Build pg_dump command
+        # Build pg_dump command (dump goes to stdout)
         # NOTE: We don't use --create to avoid database-level commands
         # This makes backups portable across different database names
         cmd = [
             '/usr/bin/pg_dump',
-            '--host', db_host,
-            '--port', db_port,
-            '--username', db_user,
-            '--dbname', db_name,
-            '--no-password',  # Use .pgpass or environment
+            *_PG_CONN_ARGS,
             '--no-owner',     # Don't set ownership
             '--no-privileges', # Don't set privileges
             '--clean',        # Add DROP TABLE statements
             '--if-exists',    # Use IF EXISTS with DROP
-            '--verbose',      # Verbose output
-            '--file', db_file
+            '--verbose'       # Verbose output
         ]
-        
-        # Set environment variables for password
-        env = os.environ.copy()
-        env['PGPASSWORD'] = db_password
-        
-        # Run pg_dump
-        result = subprocess.run(cmd, env=env, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            print(f"pg_dump error: {result.stderr}")
-            return False
+        if dump_format == 'custom':
+            cmd += ['--format', 'custom', '--compress', '3']
+        
+        # Run pg_dump, copying its output as it is produced. Verbose stderr goes to
+        # a temp file so a full stderr pipe can't stall the dump.
+        with tempfile.TemporaryFile() as stderr_file:
+            proc = subprocess.Popen(cmd, env=_PG_ENV, stdout=subprocess.PIPE, stderr=stderr_file)
+            try:
+                shutil.copyfileobj(proc.stdout, output, 1024 * 1024)
+            finally:
+                proc.stdout.close()
+                returncode = proc.wait()
+            
+            if returncode != 0:
+                stderr_file.seek(0)
+                print(f"pg_dump error: {stderr_file.read().decode(errors='replace')}")
+                return False
         
         return True
         
@@ -229,10 +441,13 @@ def download_backup(filename):
             return jsonify({'success': False, 'error': 'Invalid filename'}), 400
         
         backup_path = os.path.join(BACKUP_DIR, filename)
-        if not os.path.exists(backup_path):
+        if not os.path.isfile(backup_path):
             return jsonify({'success': False, 'error': 'Backup not found'}), 404
         
-        return send_file(backup_path, as_attachment=True, download_name=filename)
+        # Serve the path (not an open file) so gunicorn can hand it to sendfile(2),
+        # and support conditional/range requests for resumable downloads
+        return send_file(backup_path, as_attachment=True, download_name=filename,
+                         mimetype='application/zip', conditional=True, etag=True)
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -273,36 +488,39 @@ def restore_backup():
         if not allowed_file(file.filename):
             return jsonify({'success': False, 'error': 'Invalid file type'}), 400
         
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_file:
-            file.save(temp_file.name)
-            temp_path = temp_file.name
+        # Extract and restore in the background so the worker is free again;
+        # the restore thread closes the upload when done
+        upload = open_upload_for_restore(file)
+        if not start_restore(upload, file.filename, cleanup=upload.close):
+            upload.close()
+            return jsonify({'success': False, 'error': 'A restore is already running'}), 409
         
-        try:
-            # Extract and restore
-            restore_success = restore_from_zip(temp_path)
-            
-            if restore_success:
-                # Start application restart
-                restart_application()
-                return jsonify({
-                    'success': True,
-                    'message': 'Backup restored successfully. The application will restart automatically in a few seconds.'
-                })
-            else:
-                return jsonify({
-                    'success': False,
-                    'error': 'Failed to restore backup'
-                }), 500
-                
-        finally:
-            # Clean up temporary file
-            os.unlink(temp_path)
+        return jsonify({
+            'success': True,
+            'message': 'Restore started. The application will restart automatically when it finishes.'
+        })
             
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def open_upload_for_restore(file):
+    """Return a readable file for an uploaded backup that stays open after the request
+
+    Werkzeug has already spooled the upload to an unlinked temp file, so its
+    descriptor is duplicated and the zip is read in place rather than saved
+    a second time.
+    """
+    try:
+        upload = os.fdopen(os.dup(file.stream.fileno()), 'rb')
+    except (AttributeError, OSError):
+        # No real file behind the stream; fall back to a temporary copy
+        upload = tempfile.TemporaryFile()
+        file.save(upload)
+    upload.seek(0)
+    return upload
+
+
 @backup_bp.route('/api/backup/restore-existing/<filename>', methods=['POST'])
 def restore_existing_backup(filename):
     """Restore from an existing backup file"""
@@ -315,32 +533,33 @@ def restore_existing_backup(filename):
         if not os.path.exists(backup_path):
             return jsonify({'success': False, 'error': 'Backup not found'}), 404
         
-        # Restore from the existing backup file
-        restore_success = restore_from_zip(backup_path)
+        # Restore from the existing backup file in the background
+        if not start_restore(backup_path, filename):
+            return jsonify({'success': False, 'error': 'A restore is already running'}), 409
         
-        if restore_success:
-            # Start application restart
-            restart_application()
-            return jsonify({
-                'success': True,
-                'message': f'Backup {filename} restored successfully. The application will restart automatically in a few seconds.'
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Failed to restore backup'
-            }), 500
+        return jsonify({
+            'success': True,
+            'message': f'Restore of {filename} started. The application will restart automatically when it finishes.'
+        })
             
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@backup_bp.route('/api/backup/restore/status')
+def restore_status():
+    """Report the phase of the current or last background restore"""
+    return jsonify({'success': True, **read_restore_status()})
+
 def restore_from_zip(zip_path):
     """Restore database and files from ZIP backup"""
     try:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Extract ZIP file
-            with zipfile.ZipFile(zip_path, 'r') as zipf:
-                zipf.extractall(temp_dir)
+        with tempfile.TemporaryDirectory() as temp_dir, zipfile.ZipFile(zip_path, 'r') as zipf:
+            # Only the SQL dump and metadata are extracted; images are streamed
+            # straight to IMAGE_DIR once the database restore has succeeded
+            names = set(zipf.namelist())
+            for name in ("metadata.json", "database.dump", "database.sql"):
+                if name in names:
+                    zipf.extract(name, temp_dir)
             
             # Read metadata
             metadata_file = os.path.join(temp_dir, "metadata.json")
@@ -348,110 +567,159 @@ def restore_from_zip(zip_path):
                 with open(metadata_file, 'r') as f:
                     metadata = json.load(f)
             
-            # 1. Restore database
-            db_file = os.path.join(temp_dir, "database.sql")
+            # 1. Restore database (custom-format archive, or plain SQL from older backups)
+            db_file = os.path.join(temp_dir, "database.dump")
+            if not os.path.exists(db_file):
+                db_file = os.path.join(temp_dir, "database.sql")
             if os.path.exists(db_file):
                 print("Restoring database...")
+                update_restore_status(phase='db_restore')
                 if not restore_database(db_file):
                     return False
             
             # 2. Restore image files (if using filesystem storage)
             if IMAGE_STORAGE_METHOD == 'filesystem':
                 print("Cleaning up existing image files...")
+                update_restore_status(phase='image_restore')
                 # Always remove existing images directory to ensure clean restore
                 if os.path.exists(IMAGE_DIR):
-                    shutil.rmtree(IMAGE_DIR)
+                    parallel_rmtree(IMAGE_DIR)
+                os.makedirs(IMAGE_DIR, exist_ok=True)
                 
-                images_dir = os.path.join(temp_dir, "images")
-                if os.path.exists(images_dir):
+                image_entries = [info for info in zipf.infolist()
+                                 if info.filename.startswith('images/') and not info.is_dir()]
+                if image_entries:
                     print("Restoring image files...")
-                    # Copy restored images
-                    shutil.copytree(images_dir, IMAGE_DIR)
+                    restore_images_from_zip(zipf, image_entries)
                 else:
-                    print("No image files in backup, creating empty images directory...")
-                    os.makedirs(IMAGE_DIR, exist_ok=True)
-            
+                    print("No image files in backup, created empty images directory")
+
+            # A SIGHUP reload of a --preload master doesn't re-run create_app, so bring
+            # an older backup's schema up to date here
+            print("Updating restored database schema...")
+            try:
+                from thingdb.database import init_database
+                init_database()
+            except Exception as init_error:
+                print(f"Schema init error after restore: {init_error}")
+                return False
+
             return True
             
     except Exception as e:
         print(f"Restore error: {e}")
         return False
 
+def restore_images_from_zip(zipf, image_entries):
+    """Stream image entries from an open backup archive into IMAGE_DIR"""
+    image_root = os.path.realpath(IMAGE_DIR)
+    for info in image_entries:
+        dst = os.path.realpath(os.path.join(image_root, info.filename[len('images/'):]))
+        if not dst.startswith(image_root + os.sep):
+            print(f"Skipping unsafe path in backup: {info.filename}")
+            continue
+        
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        with zipf.open(info) as src, open(dst, 'wb') as out:
+            shutil.copyfileobj(src, out, 1024 * 1024)
+
+def write_cleaned_sql(db_file, output):
+    """Write a dump to a binary stream with database-level commands stripped
+
+    A line mentioning DROP DATABASE, CREATE DATABASE or \\connect is dropped along
+    with everything after it up to the next line containing 'SET '. Dumps made
+    by create_backup have none of these and are passed through unchanged.
+    """
+    if os.path.getsize(db_file) == 0:
+        return
+    
+    with open(db_file, 'rb') as infile, mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        cleaned = data
+        if _SQL_DATABASE_COMMAND.search(data):
+            cleaned = _SQL_DATABASE_BLOCK.sub(b'', data)
+        
+        chunk_size = 1024 * 1024
+        with memoryview(cleaned) as view:
+            for start in range(0, len(view), chunk_size):
+                output.write(view[start:start + chunk_size])
+
 def restore_database(db_file):
-    """Restore PostgreSQL database from SQL file"""
+    """Restore PostgreSQL database from a SQL file or a custom-format .dump archive"""
     try:
-        # Get database config from environment variables (same as config.py)
-        db_host = os.environ.get('POSTGRES_HOST', 'localhost')
-        db_port = os.environ.get('POSTGRES_PORT', '5432')
-        db_user = os.environ.get('POSTGRES_USER', 'thingdb')
-        db_password = os.environ.get('POSTGRES_PASSWORD', 'thingdb_default_pass')
-        db_name = os.environ.get('POSTGRES_DB', 'thingdb')
-        
-        # Set environment variables for password
-        env = os.environ.copy()
-        env['PGPASSWORD'] = db_password
-        
-        # Clean the SQL file to work with current database
-        # Remove database-level commands that would cause issues
-        cleaned_sql_file = db_file + '.cleaned'
-        with open(db_file, 'r') as infile:
-            with open(cleaned_sql_file, 'w') as outfile:
-                skip_until_connect = False
-                for line in infile:
-                    # Skip problematic commands
-                    if any(cmd in line for cmd in [
-                        'DROP DATABASE',
-                        'CREATE DATABASE',
-                        '\\connect'
-                    ]):
-                        skip_until_connect = True
-                        continue
-                    
-                    # After \connect, we can continue
-                    if skip_until_connect and 'SET ' in line:
-                        skip_until_connect = False
-                    
-                    if not skip_until_connect:
-                        outfile.write(line)
-        
         # First, drop existing tables to ensure clean restore
         print("Dropping existing tables...")
         drop_cmd = [
             '/usr/bin/psql',
-            '--host', db_host,
-            '--port', db_port,
-            '--username', db_user,
-            '--dbname', db_name,
-            '--no-password',
-            '--command', 'DROP TABLE IF EXISTS items CASCADE; DROP TABLE IF EXISTS images CASCADE; DROP TABLE IF EXISTS categories CASCADE; DROP TABLE IF EXISTS text_content CASCADE; DROP TABLE IF EXISTS qr_aliases CASCADE;'
+            *_PG_CONN_ARGS,
+            '--command', _DROP_DATA_TABLES
         ]
         
-        drop_result = subprocess.run(drop_cmd, env=env, capture_output=True, text=True)
+        drop_result = subprocess.run(drop_cmd, env=_PG_ENV, capture_output=True, text=True)
         if drop_result.returncode != 0:
             print(f"Drop tables warning: {drop_result.stderr}")
             # Continue anyway
         
-        # Restore using the cleaned SQL file
-        print(f"Restoring to database: {db_name}")
-        cmd = [
+        if db_file.endswith('.dump'):
+            # Custom-format archives hold no database-level commands and restore in parallel
+            print(f"Restoring to database: {_PG_DB_NAME} ({RESTORE_JOBS} jobs)")
+            cmd = [
+                '/usr/bin/pg_restore',
+                *_PG_CONN_ARGS,
+                '--no-owner',
+                '--no-privileges',
+                '--clean',
+                '--if-exists',
+                '--jobs', str(RESTORE_JOBS),
+                db_file
+            ]
+            result = subprocess.run(cmd, env=_PG_RESTORE_ENV, capture_output=True, text=True)
+            # Like psql below, statement errors are only warnings: pg_restore exits 1 and
+            # reports "errors ignored on restore" once the data is already loaded.
+            # Without that line the exit was fatal (bad archive, no connection).
+            if result.returncode != 0:
+                if _PG_RESTORE_IGNORED_ERRORS not in result.stderr:
+                    print(f"pg_restore error: {result.stderr}")
+                    return False
+                print(f"pg_restore warning: {result.stderr}")
+        else:
+            # Restore by piping the cleaned SQL into psql
+            # Remove database-level commands that would cause issues
+            print(f"Restoring to database: {_PG_DB_NAME}")
+            cmd = [
+                '/usr/bin/psql',
+                *_PG_CONN_ARGS,
+            ]
+            
+            # psql output goes to temp files so full pipes can't stall the restore
+            with tempfile.TemporaryFile() as stdout_file, tempfile.TemporaryFile() as stderr_file:
+                proc = subprocess.Popen(cmd, env=_PG_RESTORE_ENV, stdin=subprocess.PIPE,
+                                        stdout=stdout_file, stderr=stderr_file)
+                try:
+                    write_cleaned_sql(db_file, proc.stdin)
+                except BrokenPipeError:
+                    pass  # psql exited early; its return code and stderr say why
+                finally:
+                    try:
+                        proc.stdin.close()
+                    except BrokenPipeError:
+                        pass
+                    returncode = proc.wait()
+                
+                if returncode != 0:
+                    stderr_file.seek(0)
+                    print(f"psql restore error: {stderr_file.read().decode(errors='replace')}")
+                    return False
+        
+        # Flush the restored data once now rather than per commit
+        checkpoint_cmd = [
             '/usr/bin/psql',
-            '--host', db_host,
-            '--port', db_port,
-            '--username', db_user,
-            '--dbname', db_name,
-            '--no-password',
-            '--file', cleaned_sql_file
+            *_PG_CONN_ARGS,
+            '--command', 'CHECKPOINT;'
         ]
-        
-        # Run psql restore
-        result = subprocess.run(cmd, env=env, capture_output=True, text=True)
-        
-        # Clean up temp file
-        os.unlink(cleaned_sql_file)
-        
-        if result.returncode != 0:
-            print(f"psql restore error: {result.stderr}")
-            return False
+        checkpoint_result = subprocess.run(checkpoint_cmd, env=_PG_ENV, capture_output=True, text=True)
+        if checkpoint_result.returncode != 0:
+            # Needs superuser or pg_checkpoint; the server's own checkpoint will cover it
+            print(f"Checkpoint warning: {checkpoint_result.stderr}")
         
         print("Database restore completed successfully")
         return True
@@ -505,21 +773,20 @@ def get_demo_backups():
             })
         
         demos = []
-        for filename in os.listdir(demo_dir):
-            if filename.endswith('.zip'):
-                filepath = os.path.join(demo_dir, filename)
-                file_size = os.path.getsize(filepath)
-                file_mtime = os.path.getmtime(filepath)
-                
-                # Extract demo name from filename (remove .zip and underscores)
-                demo_name = filename.replace('.zip', '').replace('_', ' ').title()
-                
-                demos.append({
-                    'filename': filename,
-                    'name': demo_name,
-                    'size': format_file_size(file_size),
-                    'date': datetime.fromtimestamp(file_mtime).strftime('%Y-%m-%d %H:%M:%S')
-                })
+        with os.scandir(demo_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.zip'):
+                    stat = entry.stat()
+                    
+                    # Extract demo name from filename (remove .zip and underscores)
+                    demo_name = entry.name.replace('.zip', '').replace('_', ' ').title()
+                    
+                    demos.append({
+                        'filename': entry.name,
+                        'name': demo_name,
+                        'size': format_file_size(stat.st_size),
+                        'date': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+                    })
         
         # Sort by name
         demos.sort(key=lambda x: x['name'])
@@ -544,21 +811,14 @@ def restore_demo_backup(filename):
         if not os.path.exists(demo_path):
             return jsonify({'success': False, 'error': 'Demo backup not found'}), 404
         
-        # Restore from the demo backup file
-        restore_success = restore_from_zip(demo_path)
+        # Restore from the demo backup file in the background
+        if not start_restore(demo_path, filename):
+            return jsonify({'success': False, 'error': 'A restore is already running'}), 409
         
-        if restore_success:
-            # Start application restart
-            restart_application()
-            return jsonify({
-                'success': True,
-                'message': f'Demo "{filename}" loaded successfully. The application will restart automatically in a few seconds.'
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Failed to restore demo backup'
-            }), 500
+        return jsonify({
+            'success': True,
+            'message': f'Loading demo "{filename}". The application will restart automatically when it finishes.'
+        })
             
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -566,31 +826,16 @@ def restore_demo_backup(filename):
 def reset_database_to_empty():
     """Drop all tables and reinitialize empty database"""
     try:
-        # Get database config
-        db_host = os.environ.get('POSTGRES_HOST', 'localhost')
-        db_port = os.environ.get('POSTGRES_PORT', '5432')
-        db_user = os.environ.get('POSTGRES_USER', 'thingdb')
-        db_password = os.environ.get('POSTGRES_PASSWORD', 'thingdb_default_pass')
-        db_name = os.environ.get('POSTGRES_DB', 'thingdb')
-        
-        # Set environment variables for password
-        env = os.environ.copy()
-        env['PGPASSWORD'] = db_password
-        
         print("Resetting database to empty state...")
         
         # Drop all tables - use psql without timeout
         drop_cmd = [
             '/usr/bin/psql',
-            '--host', db_host,
-            '--port', db_port,
-            '--username', db_user,
-            '--dbname', db_name,
-            '--no-password',
-            '--command', 'DROP TABLE IF EXISTS items CASCADE; DROP TABLE IF EXISTS images CASCADE; DROP TABLE IF EXISTS categories CASCADE; DROP TABLE IF EXISTS text_content CASCADE; DROP TABLE IF EXISTS qr_aliases CASCADE; DROP TABLE IF EXISTS _schema_version CASCADE;'
+            *_PG_CONN_ARGS,
+            '--command', _DROP_ALL_TABLES
         ]
         
-        drop_result = subprocess.run(drop_cmd, env=env, capture_output=True, text=True, timeout=30)
+        drop_result = subprocess.run(drop_cmd, env=_PG_ENV, capture_output=True, text=True, timeout=30)
         if drop_result.returncode != 0:
             print(f"Drop tables error: {drop_result.stderr}")
             return False
@@ -600,7 +845,7 @@ def reset_database_to_empty():
         # Clean up image directory
         if IMAGE_STORAGE_METHOD == 'filesystem' and os.path.exists(IMAGE_DIR):
             print("Cleaning up image files...")
-            shutil.rmtree(IMAGE_DIR)
+            parallel_rmtree(IMAGE_DIR)
             os.makedirs(IMAGE_DIR, exist_ok=True)
         
         # Reinitialize database schema with timeout protection
@@ -613,6 +858,8 @@ def reset_database_to_empty():
             print(f"Schema init error (will auto-init on next access): {init_error}")
             # Not fatal - schema will be created on next DB access
         
+        # The reset runs after its request has returned, so invalidate listings here
+        bump_catalog_version()
         return True
         
     except subprocess.TimeoutExpired:
@@ -622,8 +869,27 @@ def reset_database_to_empty():
         print(f"Database reset error: {e}")
         return False
 
+def _gunicorn_master_pid():
+    """Return the gunicorn master's pid when running as one of its workers, else None"""
+    ppid = os.getppid()
+    try:
+        with open(f'/proc/{ppid}/cmdline', 'rb') as f:
+            cmdline = f.read()
+    except OSError:
+        return None
+    return ppid if b'gunicorn' in cmdline else None
+
 def restart_application():
-    """Restart the application by stopping the current process"""
+    """Restart the application by stopping the current process
+
+    Under gunicorn the master is sent SIGHUP instead, which starts fresh workers
+    and lets the old ones finish their in-flight requests (including this one).
+    """
+    master_pid = _gunicorn_master_pid()
+    if master_pid:
+        os.kill(master_pid, signal.SIGHUP)
+        return
+    
     def delayed_restart():
         # Wait a moment to allow the response to be sent
         time.sleep(2)
@@ -636,15 +902,13 @@ def restart_application():
     restart_thread.start()
 
 
+_SIZE_UNITS = ("B", "KB", "MB", "GB", "TB")
+
 def format_file_size(size_bytes):
     """Format file size in human readable format"""
-    if size_bytes == 0:
+    if size_bytes <= 0:
         return "0B"
     
-    size_names = ["B", "KB", "MB", "GB", "TB"]
-    i = 0
-    while size_bytes >= 1024 and i < len(size_names) - 1:
-        size_bytes /= 1024.0
-        i += 1
-    
-    return f"{size_bytes:.1f}{size_names[i]}"
+    # Each unit is 2**10 of the one before, so the bit length picks the unit
+    i = min((int(size_bytes).bit_length() - 1) // 10, len(_SIZE_UNITS) - 1)
+    return f"{size_bytes / (1 << (i * 10)):.1f}{_SIZE_UNITS[i]}"
@@ -2,40 +2,62 @@
 Core routes for Flask Inventory Management System
 Handles home page, GUID processing, and item viewing
 """
+import re
 import json
 from flask import Blueprint, render_template, request, redirect, url_for, jsonify
-from thingdb.database import get_db_connection
+from thingdb.database import get_db_connection, return_db_connection
 from thingdb.utils.helpers import is_valid_guid, generate_guid
 from thingdb.config import APP_VERSION
+from thingdb.models import catalog_cache, get_catalog_version
 
 core_bp = Blueprint('core', __name__)
 
+# GUID pattern looked for inside scanned URLs
+_GUID_PATTERN = re.compile(
+    r'([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})',
+    re.IGNORECASE
+)
+
 def extract_guid_from_url(url_input):
     """Extract GUID from various URL formats"""
-    import re
-    # Look for GUID pattern in the input
-    guid_pattern = r'([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})'
-    match = re.search(guid_pattern, url_input, re.IGNORECASE)
+    match = _GUID_PATTERN.search(url_input)
     return match.group(1) if match else None
 
+def _looks_like_bare_guid(value):
+    """Cheap shape check for a plain 36-character GUID (hex digits are checked later)"""
+    return (len(value) == 36 and value[8] == '-' and value[13] == '-'
+            and value[18] == '-' and value[23] == '-')
+
 @core_bp.route('/')
 def home():
     """Home page with GUID entry and QR code scanning"""
+    # Reuse the item list until something writes to the catalog
+    cache_key = ('home', get_catalog_version())
+    items = catalog_cache.get(cache_key)
+    if items is not None:
+        return render_template('home.html', items=items, version=APP_VERSION)
+    
     # Get list of existing items
     conn = get_db_connection()
     cursor = conn.cursor()
+    # Counts come from one grouped pass per table rather than a subquery per item
     cursor.execute('''
         SELECT items.guid, items.item_name, items.created_date, 
-               (SELECT COUNT(*) FROM images WHERE item_guid = items.guid) as image_count,
-               (SELECT COUNT(*) FROM text_content WHERE item_guid = items.guid) as text_count,
+               COALESCE(image_counts.image_count, 0) as image_count,
+               COALESCE(text_counts.text_count, 0) as text_count,
                primary_images.id as primary_image_id,
                items.label_number
         FROM items 
+        LEFT JOIN (SELECT item_guid, COUNT(*) as image_count FROM images GROUP BY item_guid) as image_counts
+            ON image_counts.item_guid = items.guid
+        LEFT JOIN (SELECT item_guid, COUNT(*) as text_count FROM text_content GROUP BY item_guid) as text_counts
+            ON text_counts.item_guid = items.guid
         LEFT JOIN images as primary_images ON items.guid = primary_images.item_guid AND primary_images.is_primary = TRUE
         ORDER BY items.created_date DESC
     ''')
     items = cursor.fetchall()
-    conn.close()
+    return_db_connection(conn)
+    catalog_cache.set(cache_key, items)
     
     return render_template('home.html', items=items, version=APP_VERSION)
 
@@ -47,11 +69,15 @@ def process_guid():
     if not guid_input:
         return redirect(url_for('core.home'))
     
-    # Extract GUID from URL if provided
-    guid = extract_guid_from_url(guid_input)
-    if not guid:
-        # Assume it's a direct GUID
+    if _looks_like_bare_guid(guid_input):
+        # Scanned GUID labels are the common case; no URL to extract from
         guid = guid_input
+    else:
+        # Extract GUID from URL if provided
+        guid = extract_guid_from_url(guid_input)
+        if not guid:
+            # Assume it's a direct GUID
+            guid = guid_input
     
     # Validate GUID format
     if not is_valid_guid(guid):
@@ -60,38 +86,25 @@ def process_guid():
             message=f'The provided GUID "{guid_input}" is not in the correct format.',
             details='Expected format: xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx')
     
-    # Check if this QR code is an alias
+    # Resolve the QR code in one query. In order of preference: the original
+    # input is an alias (pure GUID QR codes), the GUID extracted from a URL is
+    # an alias (URL-based QR codes), or the GUID is an existing item.
     conn = get_db_connection()
     cursor = conn.cursor()
-    
-    # First check if the original input is an alias (for pure GUID QR codes)
-    cursor.execute('SELECT item_guid FROM qr_aliases WHERE qr_code = %s', (guid_input,))
-    alias_result = cursor.fetchone()
-    
-    if alias_result:
-        # This QR code is an alias, redirect to the actual item
-        actual_guid = alias_result[0]
-        conn.close()
-        return redirect(url_for('core.item_detail', guid=actual_guid))
-    
-    # If no match found with original input, check if the extracted GUID is an alias (for URL-based QR codes)
-    if guid != guid_input:  # Only check if we extracted a GUID from a URL
-        cursor.execute('SELECT item_guid FROM qr_aliases WHERE qr_code = %s', (guid,))
-        alias_result = cursor.fetchone()
-        
-        if alias_result:
-            # This extracted GUID is an alias, redirect to the actual item
-            actual_guid = alias_result[0]
-            conn.close()
-            return redirect(url_for('core.item_detail', guid=actual_guid))
-    
-    # Check if item exists
-    cursor.execute('SELECT guid FROM items WHERE guid = %s', (guid,))
-    existing_item = cursor.fetchone()
-    
-    if existing_item:
-        conn.close()
-        return redirect(url_for('core.item_detail', guid=guid))
+    cursor.execute('''
+        SELECT item_guid, 0 as preference FROM qr_aliases WHERE qr_code = %s
+        UNION ALL
+        SELECT item_guid, 1 FROM qr_aliases WHERE qr_code = %s
+        UNION ALL
+        SELECT guid, 2 FROM items WHERE guid = %s
+        ORDER BY preference
+        LIMIT 1
+    ''', (guid_input, guid, guid))
+    match = cursor.fetchone()
+    
+    if match:
+        return_db_connection(conn)
+        return redirect(url_for('core.item_detail', guid=match[0]))
     
     # Item doesn't exist, create it temporarily and show association dialog
     cursor.execute('SELECT nextval(%s)', ('label_number_seq',))
@@ -106,7 +119,7 @@ def process_guid():
     ''', (guid, default_name, label_number, None))
     
     conn.commit()
-    conn.close()
+    return_db_connection(conn)
     
     # Redirect to item page with association dialog
     return redirect(url_for('core.item_detail', guid=guid, new_item='1'))
@@ -132,7 +145,7 @@ def item_detail(guid):
     
     item_data = cursor.fetchone()
     if not item_data:
-        conn.close()
+        return_db_connection(conn)
         return render_template('error.html',
             heading='❌ Item Not Found',
             message=f'No item found with GUID: {guid}')
@@ -172,7 +185,7 @@ def item_detail(guid):
     ''', (guid,))
     contained_items = cursor.fetchall()
     
-    conn.close()
+    return_db_connection(conn)
     
     # Check if recently created (for showing association UI)
     import datetime
@@ -211,42 +224,31 @@ def item_detail(guid):
                          categories=categories,
                          show_association=show_association)
 
-def _get_breadcrumb_trail(cursor, parent_guid):
-    """Get breadcrumb trail for nested items"""
-    breadcrumbs = []
-    current_guid = parent_guid
-    max_depth = 10  # Prevent infinite loops
-    
-    for _ in range(max_depth):
-        if not current_guid:
-            break
-            
-        cursor.execute('''
-            SELECT guid, item_name, parent_guid 
-            FROM items 
+def _get_breadcrumb_trail(cursor, parent_guid, max_depth=10):
+    """Get breadcrumb trail for nested items (root first) in one recursive query"""
+    # The depth limit also stops parent_guid cycles from recursing forever
+    cursor.execute('''
+        WITH RECURSIVE trail (guid, item_name, parent_guid, depth) AS (
+            SELECT guid, item_name, parent_guid, 0
+            FROM items
             WHERE guid = %s
-        ''', (current_guid,))
-        
-        parent_item = cursor.fetchone()
-        if not parent_item:
-            break
-            
-        breadcrumbs.insert(0, {
-            'guid': parent_item[0],
-            'name': parent_item[1]
-        })
-        
-        current_guid = parent_item[2]  # parent_guid
-    
-    return breadcrumbs
+            UNION ALL
+            SELECT items.guid, items.item_name, items.parent_guid, trail.depth + 1
+            FROM items
+            JOIN trail ON items.guid = trail.parent_guid
+            WHERE trail.depth < %s
+        )
+        SELECT guid, item_name
+        FROM trail
+        ORDER BY depth DESC
+    ''', (parent_guid, max_depth - 1))
+    
+    return [{'guid': guid, 'name': name} for guid, name in cursor.fetchall()]
 
 @core_bp.route('/api/tree-data')
 def get_tree_data():
     """API endpoint to fetch hierarchical tree data for the tree view"""
     from flask import request
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     # Get sort parameter (default to alpha)
     sort_mode = request.args.get('sort', 'alpha')
     
@@ -260,6 +262,19 @@ def get_tree_data():
     else:
         order_clause = 'ORDER BY LOWER(items.item_name) ASC'  # default to alpha
     
+    # Reuse the tree until something writes to the catalog
+    cache_key = ('tree', get_catalog_version(), order_clause)
+    tree_data = catalog_cache.get(cache_key)
+    if tree_data is not None:
+        return jsonify({
+            'success': True,
+            'data': tree_data,
+            'total_root_items': len(tree_data)
+        })
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
     try:
         # Get all root items (items with no parent)
         cursor.execute(f'''
@@ -292,6 +307,7 @@ def get_tree_data():
                 'expanded': False
             }
             tree_data.append(tree_item)
+        catalog_cache.set(cache_key, tree_data)
         
         return jsonify({
             'success': True,
@@ -305,7 +321,7 @@ def get_tree_data():
             'error': str(e)
         }), 500
     finally:
-        conn.close()
+        return_db_connection(conn)
 
 @core_bp.route('/api/tree-children/<guid>')
 def get_tree_children(guid):
@@ -379,4 +395,4 @@ def get_tree_children(guid):
             'error': str(e)
         }), 500
     finally:
-        conn.close()
\ No newline at end of file
+        return_db_connection(conn)
\ No newline at end of file
@@ -3,7 +3,7 @@ Image routes for Flask Inventory Management System
 Handles image upload, serving, rotation, and deletion
 """
 import os
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify, Response, send_file
 from werkzeug.utils import secure_filename
 from thingdb.database import get_db_connection, return_db_connection
 from thingdb.services.image_service import generate_thumbnail, generate_preview, is_valid_image, save_image_to_file, apply_rotation_to_image
@@ -13,6 +13,17 @@ from thingdb.config import IMAGE_STORAGE_METHOD, IMAGE_DIR
 
 image_bp = Blueprint('image', __name__)
 
+def _image_response(image_data, mimetype):
+    """Build an image response the browser must revalidate before reusing
+
+    Rotating an image or restoring a backup keeps the same image URL, so the
+    ETag of the content decides whether a cached copy is still current.
+    """
+    response = Response(image_data, mimetype=mimetype)
+    response.cache_control.no_cache = True
+    response.add_etag()
+    return response.make_conditional(request)
+
 @image_bp.route('/upload-image/<guid>', methods=['POST'])
 def upload_image(guid):
     """Handle image upload for an item"""
@@ -63,7 +74,7 @@ def upload_image(guid):
                   content_type, is_primary, description))
         
         conn.commit()
-        conn.close()
+        return_db_connection(conn)
         
         return jsonify({"success": True}), 200
 
@@ -76,8 +87,9 @@ def serve_image(image_id):
     if IMAGE_STORAGE_METHOD == 'filesystem':
         cursor.execute('SELECT preview_path, content_type, rotation_degrees FROM images WHERE id = %s', (image_id,))
         result = cursor.fetchone()
+        return_db_connection(conn)
+        
         if not result:
-            return_db_connection(conn)
             return 'Image not found', 404
         
         preview_path, content_type, rotation_degrees = result
@@ -85,16 +97,17 @@ def serve_image(image_id):
         
         if not os.path.exists(full_path):
             return 'Image file not found', 404
+        
+        if not rotation_degrees:
+            # Stream the file as-is (sendfile under gunicorn) rather than reading it into memory
+            # max_age=0 means revalidate every time; send_file supplies ETag and Last-Modified
+            return send_file(full_path, mimetype=content_type, conditional=True, max_age=0)
             
         with open(full_path, 'rb') as f:
             image_data = f.read()
             
-        if rotation_degrees != 0:
-            image_data = apply_rotation_to_image(image_data, rotation_degrees)
-            
-        response = Response(image_data, mimetype=content_type)
-        response.headers['Cache-Control'] = 'public, max-age=3600'
-        return response
+        image_data = apply_rotation_to_image(image_data, rotation_degrees)
+        return _image_response(image_data, content_type)
     else:
         cursor.execute('SELECT preview_data, content_type, rotation_degrees FROM images WHERE id = %s', (image_id,))
         result = cursor.fetchone()
@@ -110,9 +123,7 @@ def serve_image(image_id):
             # A more robust solution would be to fetch original image_data and apply rotation.
             pass
 
-        response = Response(preview_data, mimetype=content_type)
-        response.headers['Cache-Control'] = 'public, max-age=3600'
-        return response
+        return _image_response(preview_data, content_type)
 
 @image_bp.route('/thumbnail/<int:image_id>')
 def serve_thumbnail(image_id):
@@ -133,16 +144,15 @@ def serve_thumbnail(image_id):
         
         if not os.path.exists(full_path):
             return 'Thumbnail file not found', 404
+        
+        if not rotation_degrees:
+            return send_file(full_path, mimetype='image/webp', conditional=True, max_age=0)
             
         with open(full_path, 'rb') as f:
             image_data = f.read()
             
-        if rotation_degrees != 0:
-            image_data = apply_rotation_to_image(image_data, rotation_degrees)
-            
-        response = Response(image_data, mimetype='image/webp')
-        response.headers['Cache-Control'] = 'public, max-age=1800'
-        return response
+        image_data = apply_rotation_to_image(image_data, rotation_degrees)
+        return _image_response(image_data, 'image/webp')
     else:
         cursor.execute('SELECT thumbnail_data FROM images WHERE id = %s', (image_id,))
         result = cursor.fetchone()
@@ -153,9 +163,7 @@ def serve_thumbnail(image_id):
             
         thumbnail_data = result[0]
         
-        response = Response(thumbnail_data, mimetype='image/webp')
-        response.headers['Cache-Control'] = 'public, max-age=1800'
-        return response
+        return _image_response(thumbnail_data, 'image/webp')
 
 @image_bp.route('/rotate-image/<int:image_id>', methods=['POST'])
 def rotate_image_handler(image_id):
@@ -169,7 +177,7 @@ def rotate_image_handler(image_id):
         result = cursor.fetchone()
         
         if not result:
-            conn.close()
+            return_db_connection(conn)
             return jsonify({"success": False, "error": "Image not found"}), 404
         
         current_rotation = result[0] or 0
@@ -178,7 +186,7 @@ def rotate_image_handler(image_id):
         # Update only the rotation degrees. The rotation is applied dynamically when served.
         cursor.execute('UPDATE images SET rotation_degrees = %s WHERE id = %s', (new_rotation, image_id))
         conn.commit()
-        conn.close()
+        return_db_connection(conn)
         
         # Clear cache entries for this image
         thumbnail_cache.cache.pop(f"thumb_{image_id}", None)
@@ -201,7 +209,7 @@ def delete_image(image_id):
         result = cursor.fetchone()
         
         if not result:
-            conn.close()
+            return_db_connection(conn)
             return jsonify({"success": False, "error": "Image not found"}), 404
         
         item_guid, image_path, thumb_path, preview_path = result
@@ -209,7 +217,7 @@ def delete_image(image_id):
         # Delete the image record from the database
         cursor.execute('DELETE FROM images WHERE id = %s', (image_id,))
         conn.commit()
-        conn.close()
+        return_db_connection(conn)
         
         # If using filesystem, delete the actual files
         if IMAGE_STORAGE_METHOD == 'filesystem':
@@ -243,7 +251,7 @@ def set_primary_image(image_id):
         result = cursor.fetchone()
         
         if not result:
-            conn.close()
+            return_db_connection(conn)
             return jsonify({"success": False, "error": "Image not found"}), 404
             
         item_guid = result[0]
@@ -255,7 +263,7 @@ def set_primary_image(image_id):
         cursor.execute('UPDATE images SET is_primary = TRUE WHERE id = %s', (image_id,))
         
         conn.commit()
-        conn.close()
+        return_db_connection(conn)
         
         return jsonify({"success": True})
     
@@ -281,6 +289,11 @@ def serve_original(image_id):
         
         if not os.path.exists(full_path):
             return 'Image file not found', 404
+        
+        if not rotation:
+            # send_file sets the same inline Content-Disposition from download_name
+            return send_file(full_path, mimetype=content_type, download_name=filename,
+                             conditional=True, max_age=0)
             
         with open(full_path, 'rb') as f:
             image_data = f.read()
@@ -297,7 +310,6 @@ def serve_original(image_id):
     if rotation != 0:
         image_data = apply_rotation_to_image(image_data, rotation)
     
-    response = Response(image_data, mimetype=content_type)
+    response = _image_response(image_data, content_type)
     response.headers['Content-Disposition'] = f'inline; filename="{filename}"'
-    response.headers['Cache-Control'] = 'public, max-age=86400'
     return response
\ No newline at end of file
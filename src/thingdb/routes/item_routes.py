@@ -2,13 +2,11 @@
 Item CRUD routes for Flask Inventory Management System
 Handles item creation, editing, deletion, and relationship management
 """
-import json
 import os
 from flask import Blueprint, request, jsonify, redirect, url_for, send_file, Response
 from thingdb.database import get_db_connection
 from thingdb.utils.helpers import is_valid_guid, validate_item_data, generate_guid
-from thingdb.services.embedding_service import generate_embedding
-from thingdb.services.qr_pdf_service import qr_pdf_service
+from thingdb.services.embedding_service import generate_embedding, pack_embedding
 from thingdb.config import IMAGE_STORAGE_METHOD, IMAGE_DIR
 from thingdb.database import return_db_connection
 
@@ -91,12 +89,12 @@ def update_item_name(guid):
         try:
             embedding_vector = generate_embedding(new_name)
             if embedding_vector:
-                embedding_json = json.dumps(embedding_vector)
+                embedding_blob = pack_embedding(embedding_vector)
                 cursor.execute('''
                     UPDATE items 
                     SET embedding_vector = %s 
                     WHERE guid = %s
-                ''', (embedding_json, guid))
+                ''', (embedding_blob, guid))
         except Exception as e:
             print(f"Failed to update embedding: {e}")
         
@@ -148,12 +146,12 @@ def update_item_description(guid):
             combined_text = f"{item_name} {new_description}" if new_description else item_name
             embedding_vector = generate_embedding(combined_text)
             if embedding_vector:
-                embedding_json = json.dumps(embedding_vector)
+                embedding_blob = pack_embedding(embedding_vector)
                 cursor.execute('''
                     UPDATE items 
                     SET embedding_vector = %s 
                     WHERE guid = %s
-                ''', (embedding_json, guid))
+                ''', (embedding_blob, guid))
         except Exception as e:
             print(f"Failed to update embedding: {e}")
         
@@ -304,12 +302,12 @@ def add_category(guid):
             
             if combined_text:
                 embedding_vector = generate_embedding(combined_text)
-                embedding_json = json.dumps(embedding_vector) if embedding_vector else None
+                embedding_blob = pack_embedding(embedding_vector) if embedding_vector else None
                 
                 cursor.execute('''
                     UPDATE items SET embedding_vector = %s, updated_date = CURRENT_TIMESTAMP 
                     WHERE guid = %s
-                ''', (embedding_json, guid))
+                ''', (embedding_blob, guid))
         
         conn.commit()
         conn.close()
@@ -442,16 +440,16 @@ def create_item():
         try:
             combined_text = f"{item_name} {description}" if description else item_name
             embedding_vector = generate_embedding(combined_text)
-            embedding_json = json.dumps(embedding_vector) if embedding_vector else None
+            embedding_blob = pack_embedding(embedding_vector) if embedding_vector else None
         except Exception as e:
             print(f"Failed to generate embedding: {e}")
-            embedding_json = None
+            embedding_blob = None
         
         # Create new item
         cursor.execute('''
             INSERT INTO items (guid, item_name, description, source_url, label_number, parent_guid, embedding_vector)
             VALUES (%s, %s, %s, %s, %s, %s, %s)
-        ''', (guid, item_name, description, source_url, label_number, parent_guid, embedding_json))
+        ''', (guid, item_name, description, source_url, label_number, parent_guid, embedding_blob))
         
         conn.commit()
         conn.close()
@@ -530,12 +528,12 @@ def delete_category(category_id):
             
             if combined_text:
                 embedding_vector = generate_embedding(combined_text)
-                embedding_json = json.dumps(embedding_vector) if embedding_vector else None
+                embedding_blob = pack_embedding(embedding_vector) if embedding_vector else None
                 
                 cursor.execute('''
                     UPDATE items SET embedding_vector = %s, updated_date = CURRENT_TIMESTAMP 
                     WHERE guid = %s
-                ''', (embedding_json, item_guid))
+                ''', (embedding_blob, item_guid))
         
         conn.commit()
         conn.close()
@@ -563,6 +561,7 @@ def get_item_qr_png(guid):
         item_name = result[0] if result else None
         
         # Generate PNG
+        from thingdb.services.qr_pdf_service import qr_pdf_service
         png_buffer = qr_pdf_service.generate_single_qr_png(guid, item_name)
         png_data = png_buffer.read()
         
@@ -593,6 +592,7 @@ def get_item_qr_pdf(guid):
         item_name = result[0] if result else None
         
         # Generate PDF
+        from thingdb.services.qr_pdf_service import qr_pdf_service
         pdf_buffer = qr_pdf_service.generate_single_qr_pdf(guid, item_name)
         pdf_data = pdf_buffer.read()
         
@@ -733,6 +733,7 @@ def get_container_qr_sheet(guid):
         conn.close()
         
         # Generate multi-page PDF
+        from thingdb.services.qr_pdf_service import qr_pdf_service
         pdf_buffer = qr_pdf_service.generate_hierarchy_qr_sheet(items_data)
         pdf_data = pdf_buffer.read()
         
@@ -826,6 +827,7 @@ def get_item_full_label(guid):
         conn.close()
         
         # Generate PDF label
+        from thingdb.services.qr_pdf_service import qr_pdf_service
         pdf_buffer = qr_pdf_service.generate_item_label(
             item_data=item_data,
             breadcrumbs=breadcrumbs,
@@ -6,7 +6,7 @@ import json
 from flask import Blueprint, request, jsonify, render_template
 from thingdb.database import get_db_connection
 from thingdb.utils.helpers import clean_search_query, extract_tags_from_query, paginate_results
-from thingdb.services.embedding_service import generate_embedding, cosine_similarity, parse_embedding_from_db, is_embedding_model_available
+from thingdb.services.embedding_service import generate_embedding, generate_embeddings_batch, cosine_similarity_batch, dot_similarity, parse_embedding_from_db, pack_embedding, is_embedding_model_available
 from thingdb.config import SEMANTIC_SEARCH
 
 search_bp = Blueprint('search', __name__)
@@ -207,14 +207,7 @@ def _semantic_search(query):
         results = []
         threshold = SEMANTIC_SEARCH.get('similarity_threshold', 0.15)
         
-        for row in cursor.fetchall():
-            item_embedding = parse_embedding_from_db(row[5])
-            if not item_embedding:
-                continue
-            
-            # Calculate similarity
-            similarity = cosine_similarity(query_embedding, item_embedding)
-            
+        for row, similarity in _score_rows(query_embedding, cursor.fetchall(), 5):
             if similarity >= threshold:
                 results.append((
                     row[0],  # guid
@@ -236,6 +229,38 @@ def _semantic_search(query):
         print(f"[ERROR] Semantic search failed: {e}")
         return []
 
+def _score_rows(query_embedding, rows, embedding_index):
+    """Score database rows against a query embedding in one vectorized pass
+
+    Rows whose stored embedding is missing, unparsable, or of a different
+    dimension than the query are skipped. Returns a list of (row, similarity).
+    """
+    dimension = len(query_embedding)
+    scored_rows = []
+    vectors = []
+    
+    for row in rows:
+        try:
+            item_embedding = parse_embedding_from_db(row[embedding_index])
+        except (json.JSONDecodeError, TypeError) as e:
+            print(f"[ERROR] Failed to parse embedding for item {row[0]}: {e}")
+            continue
+        
+        if item_embedding is None or len(item_embedding) != dimension:
+            continue
+        
+        scored_rows.append(row)
+        vectors.append(item_embedding)
+    
+    if not vectors:
+        return []
+    
+    if SEMANTIC_SEARCH.get('normalize_embeddings'):
+        similarities = dot_similarity(query_embedding, vectors)
+    else:
+        similarities = cosine_similarity_batch(query_embedding, vectors)
+    return [(row, float(similarity)) for row, similarity in zip(scored_rows, similarities)]
+
 def _traditional_search(original_query, tags, clean_query):
     """Perform traditional SQL-based text search with tag support"""
     try:
@@ -317,20 +342,21 @@ def reindex_embeddings():
         cursor.execute('SELECT guid, item_name, description FROM items')
         items = cursor.fetchall()
         
+        # Combine name and description for embedding, encoding all items in batches
+        embeddings = generate_embeddings_batch(
+            [f"{item_name} {description or ''}" for guid, item_name, description in items]
+        )
+        
         updated_count = 0
-        for guid, item_name, description in items:
+        for (guid, item_name, description), embedding_vector in zip(items, embeddings):
             try:
-                # Combine name and description for embedding
-                combined_text = f"{item_name} {description or ''}"
-                embedding_vector = generate_embedding(combined_text)
-                
                 if embedding_vector:
-                    embedding_json = json.dumps(embedding_vector)
+                    embedding_blob = pack_embedding(embedding_vector)
                     cursor.execute('''
                         UPDATE items 
                         SET embedding_vector = %s 
                         WHERE guid = %s
-                    ''', (embedding_json, guid))
+                    ''', (embedding_blob, guid))
                     updated_count += 1
             except Exception as e:
                 print(f"Failed to update embedding for {guid}: {e}")
@@ -385,40 +411,23 @@ def semantic_search_api():
         print(f"[DEBUG] Found {len(items_with_embeddings)} items with embeddings")
         
         results = []
-        for row in items_with_embeddings:
-            guid, name, description, embedding_json, contained_count, primary_image_id, all_tags, label_number = row
+        for row, similarity in _score_rows(query_embedding, items_with_embeddings, 3):
+            guid, name, description, embedding_data, contained_count, primary_image_id, all_tags, label_number = row
             
-            if not embedding_json:
-                continue
-                
-            try:
-                # Parse the stored embedding
-                item_embedding = parse_embedding_from_db(embedding_json)
-                if not item_embedding:
-                    continue
-                
-                # Calculate similarity
-                similarity = cosine_similarity(query_embedding, item_embedding)
-                print(f"[DEBUG] Item '{name[:30]}...' similarity: {similarity:.3f}")
-                
-                # Only include items with reasonable similarity (threshold: 0.15)
-                if similarity >= 0.15:
-                    results.append({
-                        'guid': guid,
-                        'name': name,
-                        'description': description or '',
-                        'similarity': similarity,
-                        'match_type': 'semantic',
-                        'contained_count': contained_count,
-                        'has_image': primary_image_id is not None,
-                        'image_id': primary_image_id,
-                        'matched_tags': all_tags,
-                        'label_number': label_number
-                    })
-                    
-            except (json.JSONDecodeError, TypeError) as e:
-                print(f"[ERROR] Failed to parse embedding for item {guid}: {e}")
-                continue
+            # Only include items with reasonable similarity (threshold: 0.15)
+            if similarity >= 0.15:
+                results.append({
+                    'guid': guid,
+                    'name': name,
+                    'description': description or '',
+                    'similarity': similarity,
+                    'match_type': 'semantic',
+                    'contained_count': contained_count,
+                    'has_image': primary_image_id is not None,
+                    'image_id': primary_image_id,
+                    'matched_tags': all_tags,
+                    'label_number': label_number
+                })
         
         # Sort by similarity (highest first)
         results.sort(key=lambda x: x['similarity'], reverse=True)
@@ -510,22 +519,23 @@ def reindex_all_embeddings_api():
         updated_count = 0
         print(f"[DEBUG] Found {len(items_to_update)} items needing embeddings")
         
-        for guid, name, description in items_to_update:
+        # Combine name and description for comprehensive embedding
+        combined_texts = [f"{name or ''} {description or ''}".strip()
+                          for guid, name, description in items_to_update]
+        embeddings = generate_embeddings_batch(combined_texts)
+        
+        for (guid, name, description), combined_text, embedding_vector in zip(
+                items_to_update, combined_texts, embeddings):
             try:
-                # Combine name and description for comprehensive embedding
-                combined_text = f"{name or ''} {description or ''}".strip()
-                
                 if combined_text:
-                    # Generate embedding
-                    embedding_vector = generate_embedding(combined_text)
-                    embedding_json = json.dumps(embedding_vector) if embedding_vector else None
+                    embedding_blob = pack_embedding(embedding_vector) if embedding_vector else None
                     
                     # Update the item with the embedding
                     cursor.execute('''
                         UPDATE items 
                         SET embedding_vector = %s, updated_date = CURRENT_TIMESTAMP 
                         WHERE guid = %s
-                    ''', (embedding_json, guid))
+                    ''', (embedding_blob, guid))
                     
                     updated_count += 1
                     print(f"[DEBUG] Generated embedding for: {name or guid[:8]}")
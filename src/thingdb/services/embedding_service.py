@@ -1,52 +1,97 @@
 """
 Embedding service for semantic search functionality
 """
+import os
 import json
-import numpy as np
+import threading
+from functools import lru_cache
 from thingdb.config import SEMANTIC_SEARCH
 
+# orjson parses legacy JSON embeddings several times faster when installed
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
 # Global embedding model instance (pre-loaded)
 _embedding_model = None
+_model_lock = threading.Lock()
+
+def _reset_model_lock():
+    """Give a forked child its own unlocked lock in case the parent was mid-load"""
+    global _model_lock
+    _model_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_model_lock)
+
+# Hugging Face cache location and the two layouts the model may be stored under
+_CACHE_DIR = "/var/lib/thingdb/cache/models"
+_MODEL_PATHS = (
+    os.path.join(_CACHE_DIR, "sentence-transformers", SEMANTIC_SEARCH['model_name']),
+    os.path.join(_CACHE_DIR, f"models--sentence-transformers--{SEMANTIC_SEARCH['model_name']}"),
+)
+
+# Header for int8-quantized embeddings: marker followed by a float32 scale
+_INT8_MARKER = b'Q8'
+_INT8_HEADER_SIZE = len(_INT8_MARKER) + 4
+
+def _load_embedding_model():
+    """Load the sentence-transformers model, returning False if it can't be loaded"""
+    try:
+        from sentence_transformers import SentenceTransformer
+        
+        # Set up proper cache directory for Hugging Face models
+        os.environ['HF_HOME'] = _CACHE_DIR
+        os.environ['TRANSFORMERS_CACHE'] = _CACHE_DIR
+        
+        # Ensure cache directory exists
+        os.makedirs(_CACHE_DIR, exist_ok=True)
+        
+        # Cap torch threads so several server workers don't oversubscribe the CPU
+        torch_threads = SEMANTIC_SEARCH.get('torch_threads')
+        if torch_threads:
+            import torch
+            torch.set_num_threads(torch_threads)
+        
+        print(f"[DEBUG] Loading embedding model (cache: {_CACHE_DIR})...")
+        model = SentenceTransformer(
+            SEMANTIC_SEARCH['model_name'],
+            cache_folder=_CACHE_DIR
+        )
+        print("[DEBUG] Embedding model loaded successfully")
+        
+        # Verify model is cached
+        model_path = _find_cached_model_path()
+        if model_path:
+            print(f"[DEBUG] Model cached at: {model_path}")
+        else:
+            print("[WARNING] Model may not be properly cached")
+        return model
+            
+    except Exception as e:
+        print(f"[ERROR] Failed to load embedding model: {e}")
+        return False  # Mark as failed to avoid retries
 
 def initialize_embedding_model():
-    """Initialize the embedding model at startup with proper caching"""
+    """Initialize the embedding model once, even when several threads ask for it at the same time"""
     global _embedding_model
     if _embedding_model is None:
-        try:
-            import os
-            from sentence_transformers import SentenceTransformer
-            
-            # Set up proper cache directory for Hugging Face models
-            cache_dir = "/var/lib/thingdb/cache/models"
-            os.environ['HF_HOME'] = cache_dir
-            os.environ['TRANSFORMERS_CACHE'] = cache_dir
-            
-            # Ensure cache directory exists
-            os.makedirs(cache_dir, exist_ok=True)
-            
-            print(f"[DEBUG] Loading embedding model at startup (cache: {cache_dir})...")
-            _embedding_model = SentenceTransformer(
-                SEMANTIC_SEARCH['model_name'],
-                cache_folder=cache_dir
-            )
-            print("[DEBUG] Embedding model loaded successfully")
-            
-            # Verify model is cached
-            model_path1 = os.path.join(cache_dir, "sentence-transformers", SEMANTIC_SEARCH['model_name'])
-            model_path2 = os.path.join(cache_dir, f"models--sentence-transformers--{SEMANTIC_SEARCH['model_name']}")
-            
-            if os.path.exists(model_path1):
-                print(f"[DEBUG] Model cached at: {model_path1}")
-            elif os.path.exists(model_path2):
-                print(f"[DEBUG] Model cached at: {model_path2}")
-            else:
-                print("[WARNING] Model may not be properly cached")
-                
-        except Exception as e:
-            print(f"[ERROR] Failed to load embedding model: {e}")
-            _embedding_model = False  # Mark as failed to avoid retries
+        with _model_lock:
+            if _embedding_model is None:
+                _embedding_model = _load_embedding_model()
     return _embedding_model if _embedding_model is not False else None
 
+def preload_embedding_model_in_background():
+    """Start loading the embedding model on a daemon thread so startup doesn't wait for it"""
+    thread = threading.Thread(
+        target=initialize_embedding_model,
+        name='embedding-model-loader',
+        daemon=True
+    )
+    thread.start()
+    return thread
+
 def get_embedding_model():
     """Get the pre-loaded embedding model"""
     global _embedding_model
@@ -68,15 +113,50 @@ def generate_embedding(text):
             return None
             
         # Generate embedding
-        embedding = model.encode(clean_text)
+        embedding = model.encode(
+            clean_text,
+            normalize_embeddings=SEMANTIC_SEARCH.get('normalize_embeddings', False)
+        )
         return embedding.tolist()  # Convert to list for JSON storage
     except Exception as e:
         print(f"[ERROR] Failed to generate embedding: {e}")
         return None
 
+def generate_embeddings_batch(texts, batch_size=64):
+    """Generate embedding vectors for many texts in a single encode pass
+
+    Returns a list aligned with ``texts``; entries are None for empty texts
+    or when the model is unavailable.
+    """
+    results = [None] * len(texts)
+    model = get_embedding_model()
+    if not model:
+        return results
+
+    # Only encode non-empty texts, but remember where each one came from
+    clean_texts = [str(text).strip() if text else "" for text in texts]
+    positions = [i for i, text in enumerate(clean_texts) if text]
+    if not positions:
+        return results
+
+    try:
+        embeddings = model.encode(
+            [clean_texts[i] for i in positions],
+            batch_size=batch_size,
+            show_progress_bar=False,
+            normalize_embeddings=SEMANTIC_SEARCH.get('normalize_embeddings', False)
+        )
+        for i, embedding in zip(positions, embeddings):
+            results[i] = embedding.tolist()
+    except Exception as e:
+        print(f"[ERROR] Failed to generate batch embeddings: {e}")
+    return results
+
 def cosine_similarity(vec1, vec2):
     """Calculate cosine similarity between two vectors"""
     try:
+        import numpy as np
+
         # Ensure vectors are lists/arrays
         if isinstance(vec1, dict) or isinstance(vec2, dict):
             print(f"[ERROR] Invalid vector type: vec1={type(vec1)}, vec2={type(vec2)}")
@@ -103,15 +183,84 @@ def cosine_similarity(vec1, vec2):
         print(f"[ERROR] Cosine similarity calculation failed: {e}")
         return 0
 
-def parse_embedding_from_db(embedding_json):
-    """Parse embedding vector from database JSON format"""
-    if not embedding_json:
+def cosine_similarity_batch(query, matrix):
+    """Calculate cosine similarity between a query vector and every row of a matrix
+
+    Returns a float32 array with one score per row (0 for zero-length vectors).
+    """
+    import numpy as np
+
+    query = np.asarray(query, dtype=np.float32)
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    if matrix.ndim != 2 or matrix.shape[0] == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    query_norm = np.linalg.norm(query)
+    if query_norm == 0:
+        return np.zeros(matrix.shape[0], dtype=np.float32)
+
+    norms = np.linalg.norm(matrix, axis=1)
+    norms[norms == 0] = 1.0  # Zero rows score 0 since their dot product is 0
+
+    return (matrix @ query) / (norms * query_norm)
+
+def dot_similarity(query, matrix):
+    """Score a unit-length query against unit-length rows (cosine without the norms)
+
+    Only valid when embeddings are stored normalized; see
+    SEMANTIC_SEARCH['normalize_embeddings'].
+    """
+    import numpy as np
+
+    query = np.asarray(query, dtype=np.float32)
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    if matrix.ndim != 2 or matrix.shape[0] == 0:
+        return np.zeros(0, dtype=np.float32)
+    return matrix @ query
+
+def pack_embedding(embedding):
+    """Pack an embedding vector into bytes for database storage
+
+    Uses little-endian float32 by default. With SEMANTIC_SEARCH['embedding_storage']
+    set to 'int8' the vector is quantized with a per-vector scale instead.
+    """
+    import numpy as np
+
+    vector = np.asarray(embedding, dtype='<f4')
+    if SEMANTIC_SEARCH.get('embedding_storage') != 'int8':
+        return vector.tobytes()
+
+    max_abs = float(np.max(np.abs(vector))) if vector.size else 0.0
+    scale = max_abs / 127 if max_abs > 0 else 1.0
+    quantized = np.round(vector / scale).astype(np.int8)
+    return _INT8_MARKER + np.float32(scale).astype('<f4').tobytes() + quantized.tobytes()
+
+def unpack_embedding(data):
+    """Unpack float32 or int8-quantized bytes from the database into a float32 vector"""
+    import numpy as np
+
+    # int8 blobs are marker + 4-byte scale + one byte per dimension. A float32 blob
+    # can start with the marker bytes too, but its length is always a multiple of 4
+    # and never header + dimension, so check the length as well as the marker
+    if bytes(data[:len(_INT8_MARKER)]) == _INT8_MARKER and (
+            len(data) % 4 != 0
+            or len(data) - _INT8_HEADER_SIZE == SEMANTIC_SEARCH['embedding_dimension']):
+        scale = np.frombuffer(data, dtype='<f4', count=1, offset=len(_INT8_MARKER))[0]
+        quantized = np.frombuffer(data, dtype=np.int8, offset=_INT8_HEADER_SIZE)
+        return quantized.astype(np.float32) * scale
+    return np.frombuffer(data, dtype='<f4')
+
+def parse_embedding_from_db(embedding_data):
+    """Parse embedding vector from database format (float32 BYTEA or legacy JSON text)"""
+    if not embedding_data:
         return None
     
     try:
-        if isinstance(embedding_json, str):
-            return json.loads(embedding_json)
-        return embedding_json
+        if isinstance(embedding_data, (bytes, bytearray, memoryview)):
+            return unpack_embedding(embedding_data)
+        if isinstance(embedding_data, str):
+            return _json_loads(embedding_data)
+        return embedding_data
     except Exception as e:
         print(f"[ERROR] Failed to parse embedding: {e}")
         return None
@@ -126,44 +275,61 @@ def clear_embedding_model():
     _embedding_model = None
 
 
+def _find_cached_model_path():
+    """Return whichever cache directory layout holds the model, or None"""
+    return next((path for path in _MODEL_PATHS if os.path.exists(path)), None)
+
+
 def is_model_cached():
     """Check if the embedding model is cached locally"""
     try:
-        import os
-        cache_dir = "/var/lib/thingdb/cache/models"
-        # Check both possible cache directory structures
-        model_path1 = os.path.join(cache_dir, "sentence-transformers", SEMANTIC_SEARCH['model_name'])
-        model_path2 = os.path.join(cache_dir, f"models--sentence-transformers--{SEMANTIC_SEARCH['model_name']}")
-        return os.path.exists(model_path1) or os.path.exists(model_path2)
+        return _find_cached_model_path() is not None
     except Exception:
         return False
 
 
+def _tree_mtime(path):
+    """Latest mtime of path and its direct subdirectories
+
+    Hugging Face caches add files under blobs/ and snapshots/ without touching
+    the model directory itself, so its own mtime alone would miss a re-download.
+    """
+    latest = os.path.getmtime(path)
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                latest = max(latest, entry.stat(follow_symlinks=False).st_mtime)
+    return latest
+
+
+@lru_cache(maxsize=4)
+def _tree_size(path, mtime):
+    """Total size in bytes of all files under path; mtime is only part of the cache key"""
+    total = 0
+    stack = [path]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                else:
+                    total += entry.stat(follow_symlinks=False).st_size
+    return total
+
+
 def get_cache_info():
     """Get information about model caching"""
     try:
-        import os
-        cache_dir = "/var/lib/thingdb/cache/models"
-        # Check both possible cache directory structures
-        model_path1 = os.path.join(cache_dir, "sentence-transformers", SEMANTIC_SEARCH['model_name'])
-        model_path2 = os.path.join(cache_dir, f"models--sentence-transformers--{SEMANTIC_SEARCH['model_name']}")
-        
-        # Determine which path exists
-        if os.path.exists(model_path1):
-            model_path = model_path1
-        elif os.path.exists(model_path2):
-            model_path = model_path2
-        else:
+        model_path = _find_cached_model_path()
+        if not model_path:
             return {
                 'cached': False,
-                'path': model_path1,
+                'path': _MODEL_PATHS[0],
                 'size_mb': 0
             }
         
-        # Calculate size
-        size = sum(os.path.getsize(os.path.join(dirpath, filename))
-                  for dirpath, dirnames, filenames in os.walk(model_path)
-                  for filename in filenames)
+        # Calculate size (cached until the model directory changes)
+        size = _tree_size(model_path, _tree_mtime(model_path))
         
         return {
             'cached': True,
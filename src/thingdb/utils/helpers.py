@@ -1,6 +1,7 @@
 """
 Utility functions and helpers for Flask Inventory Management System
 """
+import os
 import uuid
 import hashlib
 from datetime import datetime
@@ -68,8 +69,7 @@ def is_allowed_file_type(filename):
     if not filename:
         return False
     
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in IMAGE_SETTINGS['allowed_extensions']
+    return os.path.splitext(filename)[1].lower() in IMAGE_SETTINGS['allowed_suffixes']
 
 def get_file_extension(filename):
     """Get file extension from filename"""